@@ -0,0 +1,168 @@
+import time
+from collections import deque
+
+from PyQt5 import QtCore, QtGui
+
+__all__ = ['FrameStats']
+
+# indexes of the values in a frame record
+_PRIMITIVES = 0
+_DRAW = 1
+_BLIT = 2
+_SLEEP = 3
+_PAINT = 4
+_REPAINTS = 5
+_FRAME = 6
+_SKIPPED = 7
+
+
+class FrameStats:
+    """
+    Per-frame instrumentation data of a graphics window (or a processing widget).
+
+    The owner calls the add_xxx() methods while a frame is in progress, and calls end_frame()
+    when the frame is finished. Times are in nanoseconds.
+
+    The add_primitive() method can be used as an Image updated listener, to count the drawing
+    operations on the image.
+    """
+
+    def __init__(self, history_size: int = 120):
+        self._history = deque(maxlen=history_size)
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all the collected data.
+        """
+        self._history.clear()
+        self._current = _new_record()
+        self._frames = 0
+        self._skipped_frames = 0
+        self._repaints = 0
+        self._primitives = 0
+        self._frame_start = time.perf_counter_ns()
+
+    def add_primitive(self):
+        self._current[_PRIMITIVES] += 1
+
+    def add_draw_time(self, ns: int):
+        self._current[_DRAW] += ns
+
+    def add_blit_time(self, ns: int):
+        self._current[_BLIT] += ns
+
+    def add_sleep_time(self, ns: int):
+        self._current[_SLEEP] += ns
+
+    def add_paint_time(self, ns: int):
+        """
+        Add a repaint of the widget and the time used.
+        """
+        self._current[_PAINT] += ns
+        self._current[_REPAINTS] += 1
+
+    def draw_finished(self):
+        """
+        The user code finished drawing the frame. The time from the frame start is counted as draw time.
+        """
+        self._current[_DRAW] += time.perf_counter_ns() - self._frame_start
+
+    def wait_finished(self):
+        """
+        Finished waiting for the frame (i.e. the timer). The time from the frame start is counted as sleep time.
+        """
+        self._current[_SLEEP] += time.perf_counter_ns() - self._frame_start
+
+    def end_frame(self, skipped: bool = False):
+        """
+        Finish the current frame and start a new one.
+
+        :param skipped: if the frame is skipped
+        """
+        now = time.perf_counter_ns()
+        record = self._current
+        record[_FRAME] = now - self._frame_start
+        record[_SKIPPED] = skipped
+        self._history.append(record)
+        self._frames += 1
+        if skipped:
+            self._skipped_frames += 1
+        self._repaints += record[_REPAINTS]
+        self._primitives += record[_PRIMITIVES]
+        self._current = _new_record()
+        self._frame_start = now
+
+    def get_stats(self) -> dict:
+        """
+        Get the collected data.
+
+        "last_frame" is the data of the last finished frame, "average" is the average of the recent frames.
+        Times are in milliseconds.
+
+        :return: the stats dict
+        """
+        history = list(self._history)
+        frame_time = sum(record[_FRAME] for record in history)
+        return {
+            'frames': self._frames,
+            'skipped_frames': self._skipped_frames,
+            'primitives': self._primitives,
+            'repaints': self._repaints,
+            'fps': len(history) * 1000000000 / frame_time if frame_time > 0 else 0,
+            'last_frame': _record_to_dict(history[-1]) if len(history) > 0 else None,
+            'average': _average_to_dict(history),
+        }
+
+    def draw_overlay(self, painter: QtGui.QPainter):
+        """
+        Draw the stats of the recent frames on the top-left corner.
+
+        :param painter: the painter to draw with
+        """
+        stats = self.get_stats()
+        avg = stats['average']
+        text = "fps {:.1f} | draw {:.1f}ms blit {:.1f}ms sleep {:.1f}ms paint {:.1f}ms | " \
+               "{:.0f} prims {:.1f} repaints | skipped {}".format(stats['fps'], avg['draw_ms'], avg['blit_ms'],
+                                                                  avg['sleep_ms'], avg['paint_ms'],
+                                                                  avg['primitives'], avg['repaints'],
+                                                                  stats['skipped_frames'])
+        painter.save()
+        painter.resetTransform()
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+        rect = painter.fontMetrics().boundingRect(text).adjusted(-4, -2, 4, 2)
+        rect.moveTo(0, 0)
+        painter.fillRect(rect, QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtCore.Qt.white)
+        painter.drawText(rect, QtCore.Qt.AlignCenter, text)
+        painter.restore()
+
+
+def _new_record() -> list:
+    return [0, 0, 0, 0, 0, 0, 0, False]
+
+
+def _record_to_dict(record: list) -> dict:
+    return {
+        'primitives': record[_PRIMITIVES],
+        'draw_ms': record[_DRAW] / 1000000,
+        'blit_ms': record[_BLIT] / 1000000,
+        'sleep_ms': record[_SLEEP] / 1000000,
+        'paint_ms': record[_PAINT] / 1000000,
+        'repaints': record[_REPAINTS],
+        'frame_ms': record[_FRAME] / 1000000,
+        'skipped': record[_SKIPPED],
+    }
+
+
+def _average_to_dict(history: list) -> dict:
+    n = max(len(history), 1)
+    return {
+        'primitives': sum(record[_PRIMITIVES] for record in history) / n,
+        'draw_ms': sum(record[_DRAW] for record in history) / n / 1000000,
+        'blit_ms': sum(record[_BLIT] for record in history) / n / 1000000,
+        'sleep_ms': sum(record[_SLEEP] for record in history) / n / 1000000,
+        'paint_ms': sum(record[_PAINT] for record in history) / n / 1000000,
+        'repaints': sum(record[_REPAINTS] for record in history) / n,
+        'frame_ms': sum(record[_FRAME] for record in history) / n / 1000000,
+    }
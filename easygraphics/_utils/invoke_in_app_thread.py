@@ -13,12 +13,15 @@
 #                                                                   #
 #####################################################################
 
+import asyncio
 import functools
 # tailored and modified by roy
 import sys
 import threading
 import time
+from concurrent.futures import Future
 from queue import Queue
+from typing import Callable, Iterable, List
 
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import QEvent, QObject, QCoreApplication
@@ -44,11 +47,29 @@ class CallEvent(QEvent):
         self._exceptions_in_main = exceptions_in_main
 
 
+class BatchCallEvent(QEvent):
+    """An event containing a list of function calls, each with a Future to hold its result."""
+    EVENT_TYPE = QEvent(QEvent.registerEventType())
+
+    def __init__(self, calls):
+        QEvent.__init__(self, self.EVENT_TYPE)
+        self.calls = calls
+
+
 class Caller(QObject):
-    """An event handler which calls the function held within a CallEvent."""
+    """An event handler which calls the function held within a CallEvent (or the functions in a BatchCallEvent)."""
 
     def event(self, event):
         event.accept()
+        if isinstance(event, BatchCallEvent):
+            for fn, future in event.calls:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn())
+                except Exception as e:
+                    future.set_exception(e)
+            return True
         exception = None
         try:
             result = event.fn(*event.args, **event.kwargs)
@@ -147,6 +168,78 @@ def invoke_in_app_thread(fn, *args, **kwargs):
         _app_lock.release()
 
 
+def invoke_in_app_thread_async(fn, *args, **kwargs) -> Future:
+    """Queue up the executing of a function in the app thread, and return a Future without waiting.
+
+    Unlike :func:`invoke_in_app_thread`, it doesn't take the global app lock, so callers in different
+    threads don't block each other. The exception raised by :code:`fn` is stored in the Future.
+
+    Arguments:
+        fn: A reference to the function or method to run in the app thread.
+
+        *args: Any arguments to pass to :code:`fn`.
+
+        **kwargs: Any keyword arguments to pass to :code:`fn`.
+
+    Returns:
+        A :code:`concurrent.futures.Future` which will hold the result of :code:`fn(*args, **kwargs)`.
+    """
+    return invoke_in_app_thread_batch([functools.partial(fn, *args, **kwargs)])[0]
+
+
+def invoke_in_app_thread_batch(fns: Iterable[Callable]) -> List[Future]:
+    """Queue up the executing of many functions in the app thread as one event, and return immediately.
+
+    The functions are called in order, in one pass of the app thread's event loop. Use
+    :code:`functools.partial` to bind the arguments.
+
+    Arguments:
+        fns: the functions to run in the app thread.
+
+    Returns:
+        A list of :code:`concurrent.futures.Future`, each holds the result of the corresponding function.
+    """
+    calls = [(fn, Future()) for fn in fns]
+    futures = [future for fn, future in calls]
+    if _caller is None:
+        # the app is not started, run them in a temporary app (see invoke_in_app_thread())
+        for fn, future in calls:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(invoke_in_app_thread(fn))
+            except Exception as e:
+                future.set_exception(e)
+    elif _wait_for_quit:  # the app is quitting.
+        for future in futures:
+            future.set_running_or_notify_cancel()
+            future.set_result(None)
+    elif len(calls) > 0:
+        QCoreApplication.postEvent(_caller, BatchCallEvent(calls))
+    return futures
+
+
+def invoke_in_app_thread_asyncio(fn, *args, **kwargs) -> asyncio.Future:
+    """Queue up the executing of a function in the app thread, and return an asyncio Future to await.
+
+    It must be called in a running asyncio event loop, for example:
+
+    .. code-block:: python
+
+        text = await invoke_in_app_thread_asyncio(get_string, "Your name:")
+
+    Arguments:
+        fn: A reference to the function or method to run in the app thread.
+
+        *args: Any arguments to pass to :code:`fn`.
+
+        **kwargs: Any keyword arguments to pass to :code:`fn`.
+
+    Returns:
+        An asyncio Future which will hold the result of :code:`fn(*args, **kwargs)`.
+    """
+    return asyncio.wrap_future(invoke_in_app_thread_async(fn, *args, **kwargs))
+
+
 def _in_app_thread_later(fn, exceptions_in_main, *args, **kwargs):
     """Asks the mainloop to call a function when it has time. Immediately
     returns the queue that was sent to the mainloop.  A call to queue.get()
@@ -212,6 +305,8 @@ def invoke_in_thread():
         def f(*args, **kwargs):
             return invoke_in_app_thread(fn, *args, **kwargs)
 
+        # f.invoke_async(...) runs fn in the app thread without waiting, and returns a Future
+        f.invoke_async = functools.partial(invoke_in_app_thread_async, fn)
         return f
 
     return wrap
@@ -0,0 +1,267 @@
+"""
+Headless benchmarks for the core drawing primitives and frame pacing.
+
+Run it with:
+
+.. code-block:: shell
+
+    python -m easygraphics.bench --output result.json
+
+The results are printed (or saved) as json, so they can be tracked over time.
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+
+from PyQt5 import QtCore
+
+import easygraphics as eg
+from easygraphics import Image, Color
+from easygraphics._utils import invoke_in_app_thread
+from easygraphics.graphwin import GraphWin
+
+__all__ = ['run_benchmarks', 'BENCHMARKS']
+
+_WIDTH = 800
+_HEIGHT = 600
+
+
+def _bench_points(image: Image, n: int):
+    for i in range(n):
+        image.draw_point(i % _WIDTH, (i // _WIDTH) % _HEIGHT)
+
+
+def _bench_lines(image: Image, n: int):
+    for i in range(n):
+        x = i % _WIDTH
+        image.draw_line(x, 0, _WIDTH - x, _HEIGHT)
+
+
+def _bench_polygons(image: Image, n: int):
+    for i in range(n):
+        x = i % (_WIDTH - 100)
+        y = (i * 7) % (_HEIGHT - 100)
+        image.draw_polygon(x, y, x + 100, y + 20, x + 60, y + 100, x + 10, y + 80)
+
+
+def _bench_text(image: Image, n: int):
+    for i in range(n):
+        image.draw_text(10, 30, "Score:", i % 100)
+
+
+def _bench_rect_text(image: Image, n: int):
+    for i in range(n):
+        image.draw_rect_text(10, 10, 200, 60, eg.TextFlags.ALIGN_CENTER, "Score:", i % 100)
+
+
+def _bench_draw_image(image: Image, n: int):
+    sprite = Image.create(32, 32)
+    sprite.set_fill_color(Color.RED)
+    sprite.fill_ellipse(16, 16, 12, 12)
+    for i in range(n):
+        image.draw_image(i % (_WIDTH - 32), (i * 3) % (_HEIGHT - 32), sprite)
+    sprite.close()
+
+
+def _bench_draw_image_without_background(image: Image, n: int):
+    sprite = Image.create(32, 32)
+    sprite.set_fill_color(Color.RED)
+    sprite.fill_ellipse(16, 16, 12, 12)
+    for i in range(n):
+        image.draw_image(i % (_WIDTH - 32), (i * 3) % (_HEIGHT - 32), sprite, with_background=False)
+    sprite.close()
+
+
+def _bench_sprites(image: Image, n: int):
+    sheet = Image.create(128, 32)
+    sheet.set_fill_color(Color.RED)
+    for i in range(4):
+        sheet.fill_ellipse(i * 32 + 16, 16, 12, 12)
+    sprites = [(i % (_WIDTH - 32), (i * 3) % (_HEIGHT - 32), ((i % 4) * 32, 0, 32, 32)) for i in range(n)]
+    image.draw_sprites(sheet, sprites, with_background=False)
+    sheet.close()
+
+
+def _bench_flood_fill(image: Image, n: int):
+    image.set_color(Color.BLACK)
+    image.rect(100, 100, 200, 200)
+    for i in range(n):
+        image.set_fill_color(Color.RED if i % 2 == 0 else Color.BLUE)
+        image.flood_fill(150, 150, Color.BLACK)
+
+
+def _bench_flood_fill_antialiased(image: Image, n: int):
+    image.set_render_quality(eg.RenderQuality.HIGH)
+    _bench_flood_fill(image, n)
+
+
+def _bench_to_bytes(image: Image, n: int):
+    for i in range(n):
+        image.to_bytes()
+
+
+def _bench_to_bytes_without_background(image: Image, n: int):
+    for i in range(n):
+        image.to_bytes(False)
+
+
+def _bench_to_bytes_raw(image: Image, n: int):
+    for i in range(n):
+        image.to_bytes(format="RGBA")
+
+
+def _bench_turtle(image: Image, n: int):
+    from easygraphics.turtle import TurtleWorld
+    world = TurtleWorld(image)
+    turtle = world.create_turtle()
+    for i in range(n):
+        turtle.forward(50)
+        turtle.left_turn(91)
+    world.close()
+
+
+BENCHMARKS = {
+    # name: (function, default operation count)
+    'points': (_bench_points, 20000),
+    'lines': (_bench_lines, 5000),
+    'polygons': (_bench_polygons, 2000),
+    'text': (_bench_text, 5000),
+    'rect_text': (_bench_rect_text, 5000),
+    'draw_image': (_bench_draw_image, 5000),
+    'draw_image_without_background': (_bench_draw_image_without_background, 200),
+    'sprites': (_bench_sprites, 5000),
+    'flood_fill': (_bench_flood_fill, 10),
+    'flood_fill_antialiased': (_bench_flood_fill_antialiased, 10),
+    'to_bytes': (_bench_to_bytes, 20),
+    'to_bytes_without_background': (_bench_to_bytes_without_background, 20),
+    'to_bytes_raw': (_bench_to_bytes_raw, 100),
+    'turtle': (_bench_turtle, 100),
+}
+"""All the benchmarks. The key is the benchmark name, the value is (function, default operation count)."""
+
+
+def _prepare_image() -> Image:
+    image = Image.create(_WIDTH, _HEIGHT)
+    random.seed(0)
+    image.set_color(Color.BLACK)
+    image.set_fill_color(Color.LIGHT_GRAY)
+    for i in range(50):
+        r = random.randint(5, 50)
+        image.draw_ellipse(random.randint(0, _WIDTH), random.randint(0, _HEIGHT), r, r)
+    return image
+
+
+def _run_benchmark(name: str, repeat: int, scale: float) -> dict:
+    fun, count = BENCHMARKS[name]
+    count = max(1, int(count * scale))
+    timings = []
+    for i in range(repeat):
+        image = _prepare_image()
+        start = time.perf_counter()
+        fun(image, count)
+        timings.append(time.perf_counter() - start)
+        image.close()
+    best = min(timings)
+    return {
+        'ops': count,
+        'repeat': repeat,
+        'best_seconds': best,
+        'mean_seconds': statistics.mean(timings),
+        'ops_per_second': count / best if best > 0 else math.inf,
+    }
+
+
+def _bench_delay_fps(fps: int, frames: int) -> dict:
+    """ measure the jitter of delay_fps() on a hidden graphics window """
+    win = invoke_in_app_thread.invoke_in_app_thread(GraphWin, _WIDTH, _HEIGHT)
+    win.set_immediate(False)
+    canvas = win.get_canvas()
+    intervals = []
+    last = time.perf_counter()
+    for i in range(frames):
+        canvas.clear()
+        canvas.draw_ellipse(i % _WIDTH, _HEIGHT // 2, 20, 20)
+        win.delay_fps(fps)
+        now = time.perf_counter()
+        intervals.append((now - last) * 1000)
+        last = now
+    invoke_in_app_thread.invoke_in_app_thread(win.close)
+    # the first frame only starts the clock
+    intervals = intervals[1:]
+    target = 1000 / fps
+    return {
+        'fps': fps,
+        'frames': len(intervals),
+        'target_ms': target,
+        'mean_ms': statistics.mean(intervals),
+        'stdev_ms': statistics.pstdev(intervals),
+        'max_ms': max(intervals),
+        'max_jitter_ms': max(abs(t - target) for t in intervals),
+    }
+
+
+def run_benchmarks(names=None, repeat: int = 3, scale: float = 1, fps: int = 60, frames: int = 120) -> dict:
+    """
+    Run the benchmarks.
+
+    The graphics system must be inited in headless mode (init_graph(headless=True)) before calling this function.
+
+    :param names: names of the benchmarks to run (see BENCHMARKS). None means run all.
+    :param repeat: how many times each benchmark is run. The best time is used.
+    :param scale: factor applied to the default operation counts
+    :param fps: the fps used to measure delay_fps() jitter
+    :param frames: how many frames used to measure delay_fps() jitter. 0 means don't measure.
+    :return: the results as a json serializable dict
+    """
+    if names is None:
+        names = list(BENCHMARKS.keys())
+    results = {}
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError("Unknown benchmark: {}".format(name))
+        results[name] = _run_benchmark(name, repeat, scale)
+    report = {
+        'easygraphics': eg.__version__,
+        'python': platform.python_version(),
+        'qt': QtCore.QT_VERSION_STR,
+        'platform': platform.platform(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'results': results,
+    }
+    if frames > 0:
+        report['delay_fps'] = _bench_delay_fps(fps, frames)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m easygraphics.bench",
+                                     description="Run easygraphics benchmarks and output the results as json.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all). Choices: "
+                                                 + ", ".join(BENCHMARKS.keys()))
+    parser.add_argument("-o", "--output", help="save the json result to this file (default: print to stdout)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="times to run each benchmark (default: 3)")
+    parser.add_argument("-s", "--scale", type=float, default=1, help="factor of the operation counts (default: 1)")
+    parser.add_argument("--fps", type=int, default=60, help="fps used to measure delay_fps() (default: 60)")
+    parser.add_argument("--frames", type=int, default=120,
+                        help="frames used to measure delay_fps(), 0 to skip (default: 120)")
+    args = parser.parse_args(argv)
+    eg.init_graph(headless=True)
+    try:
+        report = run_benchmarks(args.names or None, args.repeat, args.scale, args.fps, args.frames)
+    finally:
+        eg.close_graph()
+    content = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(content)
+    else:
+        print(content)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -241,6 +241,43 @@ class MouseMessageType:
     RELEASE_MESSAGE = 2
 
 
+class EventType:
+    """
+    These are the types of the input events returned by poll_events().
+    """
+    KEY_PRESS = 1
+    KEY_RELEASE = 2
+    MOUSE_PRESS = 3
+    MOUSE_RELEASE = 4
+    MOUSE_MOVE = 5
+    MOUSE_WHEEL = 6
+
+
+class RenderQuality:
+    """
+    These are the render quality presets of the images (see set_render_quality()).
+    """
+    LOW = 0
+    """No anti-aliasing at all, even for texts. It's the fastest."""
+    NORMAL = 1
+    """Anti-aliased texts, aliased shapes and images. This is the default."""
+    HIGH = 2
+    """Anti-aliased shapes and texts, and smooth image transformations.
+    Flood fill finds the (blended) borders with the help of the image's aliased mask."""
+
+
+class SplineType:
+    """
+    These are the kinds of the splines drawn by draw_curve().
+    """
+    CATMULL_ROM = 0
+    """Uniform Catmull-Rom spline. The curve passes through the control points."""
+    CENTRIPETAL_CATMULL_ROM = 1
+    """Centripetal Catmull-Rom spline. Like CATMULL_ROM, but it never forms cusps or loops inside a segment."""
+    B_SPLINE = 2
+    """Uniform cubic B-spline. The curve is smoother, but doesn't pass through the control points."""
+
+
 class FillRule:
     """
     The Rule for fill polygons.
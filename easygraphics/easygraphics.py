@@ -1,63 +1,73 @@
+import asyncio
+import multiprocessing
 import sys
 import threading
 import time
 import math
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from functools import reduce
 from typing import List, Optional
 import os
 import apng
+import numpy as np
 
 from PyQt5 import QtWidgets
 
 from .consts import *
 from ._utils import invoke_in_app_thread
 from .graphwin import GraphWin
-from .image import Image
+from .image import Image, _prepare_image_for_copy, _save_image
+from .tiledimage import TiledImage
 from .utils3d import *
 
 __all__ = [
     # consts
     'Color', 'FillStyle', 'LineStyle', 'RenderMode', 'CompositionMode', 'TextFlags',
-    'MouseMessageType', 'FillRule', 'ShapeMode', 'VertexType',
+    'MouseMessageType', 'FillRule', 'ShapeMode', 'VertexType', 'EventType', 'SplineType', 'RenderQuality',
     #  setting functions #
     'set_line_style', 'get_line_style', 'set_line_width', 'get_line_width',
     'get_color', 'set_color', 'get_fill_color', 'set_fill_color', 'get_fill_style', 'set_fill_style',
     'get_background_color', 'set_background_color', 'set_font', 'get_font', 'set_font_size', 'get_font_size',
-    'set_composition_mode', 'get_composition_mode', 'get_drawing_x', 'get_drawing_y', 'set_view_port',
+    'set_composition_mode', 'get_composition_mode', 'set_render_quality', 'get_render_quality', 'get_drawing_x', 'get_drawing_y', 'set_view_port',
     'reset_view_port', 'set_origin', 'get_fill_rule', 'set_fill_rule',
-    'set_render_mode', 'get_render_mode', 'get_drawing_pos', 'set_clip_rect', 'set_clipping',
+    'set_render_mode', 'get_render_mode', 'set_active_page', 'get_active_page', 'set_visual_page',
+    'get_visual_page', 'get_drawing_pos', 'set_clip_rect', 'set_clipping',
     'set_window', 'reset_window', 'translate', 'rotate', 'scale', 'skew', 'shear', 'set_flip_y',
     'reflect', 'flip', 'mirror', 'reset_transform', 'save_settings', 'restore_settings',
     'get_width', 'get_height', 'get_write_mode', 'set_write_mode', 'get_transform', 'set_transform',
-    'push_transform', 'pop_transform', 'set_rect_mode', 'get_rect_mode', 'set_ellipse_mode', 'get_ellipse_mode',
+    'push_transform', 'pop_transform', 'map_points', 'set_rect_mode', 'get_rect_mode', 'set_ellipse_mode', 'get_ellipse_mode',
     # drawing functions #
     'draw_point', 'put_pixel', 'get_pixel', 'line', 'draw_line', 'move_to', 'move_rel', 'line_to', 'line_rel',
     'circle', 'draw_circle', 'fill_circle', 'ellipse', 'draw_ellipse', 'fill_ellipse',
     'arc', 'draw_arc', 'pie', 'draw_pie', 'fill_pie', 'chord', 'draw_chord', 'fill_chord',
     'bezier', 'draw_bezier', 'lines', 'draw_lines', 'poly_line', 'draw_poly_line', 'polygon', 'draw_polygon',
-    'fill_polygon', 'rect', 'draw_rect', 'fill_rect', 'rounded_rect', 'draw_rounded_rect', 'fill_rounded_rect',
-    'flood_fill', 'draw_image', 'capture_screen', 'clear_device', 'clear_view_port',
+    'fill_polygon', 'draw_polygons', 'rect', 'draw_rect', 'fill_rect', 'rounded_rect', 'draw_rounded_rect', 'fill_rounded_rect',
+    'flood_fill', 'draw_image', 'draw_sprites', 'capture_screen', 'clear_device', 'clear_view_port',
     'quadratic', 'draw_quadratic', 'fill_image', 'clear', 'draw_curve', 'curve',
     'begin_shape', 'end_shape', 'vertex', 'bezier_vertex', 'quadratic_vertex', 'curve_vertex',
     # text functions #
     'draw_text', 'draw_rect_text', 'text_width', 'text_height',
     # image functions #
     'set_target', 'get_target', 'create_image', 'save_image', 'close_image', 'load_image', 'put_image',
+    'save_images', 'render_many',
     # time control functions#
-    'pause', 'delay', 'delay_fps', 'delay_jfps', 'is_run',
+    'pause', 'delay', 'delay_fps', 'delay_jfps', 'is_run', 'enable_frame_stats', 'get_frame_stats',
+    'next_frame',
     # keyboard and mouse functions #
     'has_kb_msg', 'has_kb_hit', 'has_mouse_msg', 'get_key', 'get_char', 'get_mouse_msg', 'get_cursor_pos', 'get_click',
+    'poll_events',
     "contains_left_button", "contains_right_button", "contains_mid_button",
     # init and close graph window #
-    'init_graph', 'close_graph', 'set_caption', 'get_graphics_window', 'show_image',
+    'init_graph', 'close_graph', 'set_caption', 'get_graphics_window', 'show_image', 'run_async',
     # animation
     'begin_recording', 'save_recording', 'add_record', 'end_recording',
     # utility functions #
     'color_gray', 'color_rgb', 'color_cmyk', 'color_hsv', 'rgb', 'to_alpha', 'pol2cart', 'cart2pol',
     # utility functions for 3d
-    'ortho_look_at', 'isometric_projection', 'cart2spher', 'spher2cart',
+    'ortho_look_at', 'isometric_projection', 'cart2spher', 'spher2cart', 'project_points', 'project_mesh',
+    'draw_mesh',
     # 'GraphWin',
-    'Image',
+    'Image', 'TiledImage',
 ]
 
 _in_ipython = False
@@ -357,6 +367,33 @@ def get_composition_mode(image: Image = None) -> int:
     return image.get_composition_mode()
 
 
+def set_render_quality(quality: int, image: Image = None):
+    """
+    Set the render quality of the specified image.
+
+    RenderQuality.HIGH draws anti-aliased shapes, which look smoother but are slower to draw.
+    Batch jobs can use RenderQuality.LOW to draw faster.
+
+    :param quality: the render quality preset (see RenderQuality)
+    :param image: the target image whose render quality is to be set. None means it is the target image
+         (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.set_render_quality(quality)
+
+
+def get_render_quality(image: Image = None) -> int:
+    """
+    Get the render quality of the specified image.
+
+    :param image: the target image whose render quality is to be gotten. None means it is the target image
+        (see set_target() and get_target()).
+    :return: the render quality preset (see RenderQuality)
+    """
+    image = _get_target_image(image)
+    return image.get_render_quality()
+
+
 get_write_mode = get_composition_mode
 
 set_write_mode = set_composition_mode
@@ -406,6 +443,21 @@ def set_transform(transform: QtGui.QTransform, image: Image = None):
     return image.set_transform(transform)
 
 
+def map_points(points, image: Image = None) -> np.ndarray:
+    """
+    Map the points with the current transform, i.e. get their coordinates on the image.
+
+    All the points are mapped in one numpy matrix multiply.
+
+    :param points: (N,2) array (or list of (x, y) pairs, or a flat list x0, y0, x1, y1, ...) of the points
+    :param image: the target image whose transform is used. None means it is the target image
+        (see set_target() and get_target()).
+    :return: (N,2) array of the mapped points
+    """
+    image = _get_target_image(image)
+    return image.map_points(points)
+
+
 def push_transform(image: Image = None):
     """
     Push (save) the current transform to the transform stack.
@@ -729,6 +781,7 @@ def save_settings(image: Image = None):
     """
     Save current drawing settings.
 
+    Settings are saved to a stack, so save_settings()/restore_settings() can be nested.
     See restore_settings().
 
     Note: background_color and current position won't  be saved and restored.
@@ -791,6 +844,68 @@ def get_render_mode():
         return RenderMode.RENDER_MANUAL
 
 
+def set_active_page(page: int):
+    """
+    Set the active page of the graphics window, and use it as the target image.
+
+    The graphics window can have many pages (off-screen images). The drawings are done on the active
+    page, and the visual page is shown in the window (see set_visual_page()). Animations can draw the
+    next frame on a hidden page, and flip the pages when it's finished:
+
+    >>> from easygraphics import *
+    >>> init_graph(400, 300)
+    >>> page = 0
+    >>> for i in range(100):
+    >>>     page = 1 - page
+    >>>     set_active_page(page)
+    >>>     clear_device()
+    >>>     fill_circle(i * 4, 150, 20)
+    >>>     set_visual_page(page)
+    >>>     delay(20)
+    >>> close_graph()
+
+    Page 0 is the page shown when the graphics window is created. The other pages are created when
+    they are first used.
+
+    :param page: the page number
+    """
+    global _target_image
+    _check_app_run(True)
+    _target_image = _win.set_active_page(page)
+
+
+def get_active_page() -> int:
+    """
+    Get the active page of the graphics window (see set_active_page()).
+
+    :return: the page number
+    """
+    _check_app_run(True)
+    return _win.get_active_page()
+
+
+def set_visual_page(page: int):
+    """
+    Set the visual page, i.e. the page shown in the graphics window (see set_active_page()).
+
+    The pages are swapped in the window without copying.
+
+    :param page: the page number
+    """
+    _check_app_run(True)
+    _win.set_visual_page(page)
+
+
+def get_visual_page() -> int:
+    """
+    Get the visual page of the graphics window (see set_visual_page()).
+
+    :return: the page number
+    """
+    _check_app_run(True)
+    return _win.get_visual_page()
+
+
 # drawings
 
 def draw_point(x: float, y: float, image: Image = None):
@@ -1222,16 +1337,30 @@ def draw_bezier(x0: float, y0: float, x1: float, y1: float, x2: float, y2: float
 bezier = draw_bezier
 
 
-def draw_curve(*points, image: Image = None):
+def draw_curve(*points, spline_type: int = SplineType.CATMULL_ROM, tolerance: float = 0, image: Image = None):
     """
-    Draw a Catmull-Rom spline.
+    Draw a spline.
+
+    The control points can be given as numbers (x0, y0, x1, y1, ...), or as one (N,2) numpy array
+    (or a list of (x, y) pairs). The whole spline is drawn as one path.
+
+    >>> from easygraphics import *
+    >>> import numpy as np
+    >>> init_graph(600, 400)
+    >>> xs = np.linspace(0, 600, 200)
+    >>> draw_curve(np.column_stack((xs, 200 + 100 * np.sin(xs / 50))), tolerance=0.25)
+    >>> pause()
+    >>> close_graph()
 
     :param points: control points
+    :param spline_type: kind of the spline (see SplineType)
+    :param tolerance: if > 0, the curve is flattened to a polyline, whose distance to the curve is
+        less than the tolerance (in pixels). 0 means draw the exact curve.
     :param image: the target image which will be painted on. None means it is the target image
         (see set_target() and get_target()).
     """
     image = _get_target_image(image)
-    image.draw_curve(*points)
+    image.draw_curve(*points, spline_type=spline_type, tolerance=tolerance)
 
 
 curve = draw_curve
@@ -1397,6 +1526,73 @@ def fill_polygon(*vertices, image: Image = None):
     image.fill_polygon(*vertices)
 
 
+def draw_polygons(polygons, colors=None, image: Image = None):
+    """
+    Draw many polygons in one call.
+
+    "polygons" is a (M,K,2) array (or nested list) of M polygons, each with K vertices. The polygons
+    are drawn in order (filled and with outline), so the later ones cover the former ones.
+
+    It's much faster than calling draw_polygon() for each polygon.
+
+    >>> from easygraphics import *
+    >>> init_graph(600,600)
+    >>> draw_polygons([[(50,50),(300,50),(50,300)],[(100,100),(400,100),(100,400)]],[Color.RED,Color.BLUE])
+    >>> pause()
+    >>> close_graph()
+
+    :param polygons: the polygons' vertices
+    :param colors: list of the fill colors of each polygon. None means use the current fill color.
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.draw_polygons(polygons, colors)
+
+
+def draw_mesh(matrix: QtGui.QMatrix4x4, vertices, faces, colors=None, wireframe: bool = False,
+              cull_back_faces: bool = True, image: Image = None):
+    """
+    Project a 3d mesh with the orthographic projection matrix, and draw it.
+
+    Vertices are projected in one matrix multiply (see project_mesh()), back faces are removed and the
+    remaining faces are drawn from back to front in one batch.
+
+    Faces must be defined counter-clockwise when seen from the outside of the mesh, and all faces must
+    have the same number of vertices.
+
+    >>> from easygraphics import *
+    >>> init_graph(600,600)
+    >>> set_origin(300,300)
+    >>> vertices = [(x,y,z) for x in (-100,100) for y in (-100,100) for z in (-100,100)]
+    >>> faces = [(0,1,3,2),(4,6,7,5),(0,4,5,1),(2,3,7,6),(0,2,6,4),(1,5,7,3)]
+    >>> draw_mesh(isometric_projection(),vertices,faces)
+    >>> pause()
+    >>> close_graph()
+
+    :param matrix: the projection matrix (see ortho_look_at() and isometric_projection())
+    :param vertices: (N,3) array like of the 3d vertices
+    :param faces: (M,K) array like of vertex indexes, each row is a face with K vertices
+    :param colors: list of the fill colors of each face. None means use the current fill color.
+    :param wireframe: True to only draw the outlines of the faces
+    :param cull_back_faces: True to skip the faces facing away from the viewer
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    polygons, indexes = project_mesh(matrix, vertices, faces, cull_back_faces)
+    if wireframe:
+        path = QtGui.QPainterPath()
+        for polygon in polygons:
+            path.addPolygon(QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in polygon]))
+            path.closeSubpath()
+        image.path(path)
+    else:
+        if colors is not None:
+            colors = [colors[i] for i in indexes]
+        image.draw_polygons(polygons, colors)
+
+
 def rect(left: float, top: float, right: float, bottom: float, image: Image = None):
     """
     Draws a rectangle outline with upper left corner at (left, top) and lower right corner at (right,bottom).
@@ -1566,6 +1762,35 @@ def draw_image(x: int, y: int, src_image: Image, src_x: int = 0, src_y: int = 0,
 put_image = draw_image
 
 
+def draw_sprites(src_image: Image, sprites, with_background=True, composition_mode=None, dst_image: Image = None):
+    """
+    Draw many parts of the source image (a sprite sheet) to the destination image (dst_image) in one call.
+
+    "sprites" is a list of (x, y) or (x, y, src_rect). (x, y) is the top-left point in the destination
+    image that is to be drawn onto, src_rect is (src_x, src_y, src_width, src_height), the part of the source
+    image to be drawn. If src_rect is missing or None, the whole source image is drawn. See draw_image().
+
+    The foregrounds of the source image are cached until the source image is changed, so drawing
+    sprites without background is as fast as with background.
+
+    >>> from easygraphics import *
+    >>> init_graph(800,600)
+    >>> sheet = load_image("sprites.png")
+    >>> draw_sprites(sheet, [(100, 100, (0, 0, 32, 32)), (200, 100, (32, 0, 32, 32))], with_background=False)
+    >>> pause()
+    >>> close_graph()
+
+    :param src_image: the source image (sprite sheet)
+    :param sprites: list of (x, y, src_rect)
+    :param with_background: if the background should be copied.
+    :param composition_mode: if is None, use dst image's composition mode to copy.
+    :param dst_image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    dst_image = _get_target_image(dst_image)
+    dst_image.draw_sprites(src_image, sprites, with_background, composition_mode)
+
+
 def capture_screen(left: int, top: int, right: int, bottom: int, target_img: Image):
     """
     Caputre specified region on the graphics windows to target image.
@@ -1633,9 +1858,9 @@ def curve_vertex(x: float, y: float, image: Image = None):
     image.curve_vertex(x, y)
 
 
-def vertex(x: float, y: float, image: Image = None):
+def vertex(x: float, y: float, color=None, image: Image = None):
     image = _get_target_image(image)
-    image.vertex(x, y)
+    image.vertex(x, y, color)
 
 
 def bezier_vertex(x1: float, y1: float, x2: float, y2: float, x3: float, y3: float, image: Image = None):
@@ -1726,7 +1951,7 @@ def set_target(image: Image = None):
     if image is None:
         if _headless:
             raise RuntimeError("Can't set target to graphics window in headless mode!")
-        _target_image = _win.get_canvas()
+        _target_image = _win.get_active_canvas()
     else:
         _target_image = image
 
@@ -1740,15 +1965,19 @@ def get_target() -> Optional[Image]:
     return _target_image
 
 
-def create_image(width, height) -> Image:
+def create_image(width, height, format: int = QtGui.QImage.Format_ARGB32_Premultiplied) -> Image:
     """
     Create a new image.
 
+    Images that don't need transparency can use the more compact RGB32 or Grayscale8 formats.
+
     :param width: width of the new image
     :param height: height of the new image
+    :param format: format of the new image, one of QImage.Format_ARGB32_Premultiplied (the default),
+            Format_ARGB32, Format_RGB32 and Format_Grayscale8
     :return: the created image
     """
-    return Image.create(width, height)
+    return Image.create(width, height, format)
 
 
 def close_image(image: Image):
@@ -1770,7 +1999,7 @@ def load_image(filename: str) -> Image:
     return Image.create_from_file(filename)
 
 
-def save_image(filename: str, with_background=True, image: Image = None):
+def save_image(filename: str, with_background=True, image: Image = None, format: str = None, quality: int = -1):
     """
     Save image to file.
 
@@ -1778,13 +2007,82 @@ def save_image(filename: str, with_background=True, image: Image = None):
 
     Note that JPEG format doesn\'t support transparent. Use PNG format if you want a transparent background.
 
+    The format can be any format supported by Qt (i.e. "PNG", "JPG", "BMP", "PPM"), or "RGBA" for the
+    uncompressed raw RGBA bytes. None means it's guessed from the file's suffix.
+
+    Quality is in the range 0 to 100, -1 means the default setting. For PNG, it's the compression level:
+    0 gives the smallest file and 100 gives the fastest encoding (no compression).
+
     :param filename: path of the file
     :param with_background: True to save the background together. False not
     :param image: the target image which will be saved. None means it is the target image
         (see set_target() and get_target()).
+    :param format: format of the file
+    :param quality: quality (or compression level) of the image
     """
     image = _get_target_image(image)
-    image.save(filename, with_background)
+    image.save(filename, with_background, format, quality)
+
+
+def save_images(images, with_background=True, format: str = None, quality: int = -1, workers: int = None):
+    """
+    Save many images to files in parallel.
+
+    "images" is a list of (image, filename). The contents of the images are copied first, so the images
+    can be drawn again as soon as the function returns. Then they are encoded and written by a thread pool
+    (Qt releases the GIL while encoding).
+
+    See save_image() for the format and quality parameters.
+
+    :param images: list of (image, filename)
+    :param with_background: True to save the background together. False not
+    :param format: format of the files. None means it's guessed from each file's suffix.
+    :param quality: quality (or compression level) of the images
+    :param workers: number of threads. None means the number of processors.
+    """
+    snapshots = [(_prepare_image_for_copy(image, with_background).copy(), filename) for image, filename in images]
+    with ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+        futures = [executor.submit(_save_image, img, filename, format, quality) for img, filename in snapshots]
+        for future in futures:
+            future.result()
+
+
+def render_many(fn, params, workers: int = None) -> list:
+    """
+    Run independent headless renderings in parallel processes.
+
+    fn(param) is called for each param in a pool of worker processes, and the results are returned in order.
+    The workers don't have the graphics window. fn should draw on images created by create_image(),
+    and return picklable results (i.e. image.to_bytes()), or save the images to files by itself.
+
+    fn must be a module level function, so it can be used in the worker processes.
+
+    >>> from easygraphics import *
+    >>> def render(n):
+    >>>     img = create_image(400, 300)
+    >>>     img.draw_text(10, 30, "Frame {}".format(n))
+    >>>     img.save("frame{}.png".format(n))
+    >>> if __name__ == "__main__":
+    >>>     render_many(render, range(100))
+
+    :param fn: the rendering function
+    :param params: the params of the renderings
+    :param workers: number of worker processes. None means the number of processors.
+    :return: list of the results
+    """
+    # fork is not safe when the Qt app thread is running, so always start fresh processes
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_render_worker) as executor:
+        return list(executor.map(fn, params))
+
+
+_render_worker_app = None
+
+
+def _init_render_worker():
+    global _render_worker_app
+    # text rendering needs an application instance. The worker draws on images only, no event loop is needed.
+    _render_worker_app = QtWidgets.QApplication([])
 
 
 def show_image(image: Image = None):
@@ -1974,6 +2272,30 @@ def delay_fps(fps: int):
     return _win.delay_fps(fps)
 
 
+async def next_frame(fps: int) -> bool:
+    """
+    Wait for the next frame in a coroutine, to control fps (Frame per seconds).
+
+    It's the asyncio version of delay_fps(): instead of sleeping the thread, it awaits, so other
+    asyncio tasks (networking, I/O, etc.) can run while waiting for the next frame.
+
+    >>> from easygraphics import *
+    >>> async def main():
+    >>>     set_render_mode(RenderMode.RENDER_MANUAL)
+    >>>     x = 0
+    >>>     while await next_frame(60):
+    >>>         clear()
+    >>>         fill_circle(x, 300, 50)
+    >>>         x = (x + 2) % 800
+    >>> run_async(main)
+
+    :param fps: the desire fps
+    :return: False the graphics window is closed. True otherwise.
+    """
+    _check_not_headless_and_in_shell()
+    return await _win.next_frame(fps)
+
+
 def delay_jfps(fps, max_skip_count=0):
     """
     Delay to control fps with frame skipping.
@@ -1988,6 +2310,43 @@ def delay_jfps(fps, max_skip_count=0):
     return _win.delay_jfps(fps, max_skip_count)
 
 
+def enable_frame_stats(enabled: bool = True, overlay: bool = False):
+    """
+    Turn on/off the per-frame instrumentation of the graphics window.
+
+    When enabled, the drawing operations on the graphics window, and the time used by your drawing code,
+    blitting, sleeping and repainting are recorded for each frame ( a frame ends at each delay()/delay_fps()/
+    delay_jfps() call). Use get_frame_stats() to get the data.
+
+    The instrumentation is off by default, and costs nearly nothing when off.
+
+    :param enabled: True to turn on, False to turn off
+    :param overlay: True to show the stats on the top-left corner of the graphics window
+    """
+    _check_not_headless_and_in_shell()
+    _win.enable_frame_stats(enabled, overlay)
+
+
+def get_frame_stats() -> dict:
+    """
+    Get the per-frame instrumentation data of the graphics window.
+
+    The result is a dict with:
+
+    * **frames**, **skipped_frames**, **primitives**, **repaints**: total counts since enabled
+    * **fps**: the frame rate of the recent frames
+    * **last_frame**: data of the last frame (primitives, draw_ms, blit_ms, sleep_ms, paint_ms, repaints,
+      frame_ms, skipped)
+    * **average**: average data of the recent frames
+
+    See enable_frame_stats().
+
+    :return: the stats dict
+    """
+    _check_not_headless_and_in_shell()
+    return _win.get_frame_stats()
+
+
 # mouse and keyboards #
 
 def has_kb_hit() -> bool:
@@ -2040,6 +2399,33 @@ def get_mouse_msg() -> (int, int, int, int):
     return _win.get_mouse_msg()
 
 
+def poll_events() -> list:
+    """
+    Get all the pending input events, and remove them from the event queue.
+
+    Unlike get_key() and get_mouse_msg(), no event is lost (unless more than 1024 events are not polled),
+    and it never waits or updates the window. So it's suitable to process the input in batch in each frame
+    of an animation.
+
+    Each event has the following attributes: type (see EventType), x, y, button, buttons, key, text,
+    modifiers, delta (of the wheel) and timestamp (in milliseconds, given by the window system).
+
+    >>> from easygraphics import *
+    >>> init_graph(800,600)
+    >>> set_render_mode(RenderMode.RENDER_MANUAL)
+    >>> while is_run():
+    >>>     for e in poll_events():
+    >>>         if e.type == EventType.MOUSE_MOVE:
+    >>>             draw_point(e.x, e.y)
+    >>>     delay_fps(60)
+    >>> close_graph()
+
+    :return: list of the events, the oldest first
+    """
+    _check_not_headless_and_in_shell()
+    return _win.poll_events()
+
+
 def get_click() -> (int, int, int):
     """
     Get the mouse click message.
@@ -2170,6 +2556,27 @@ def init_graph(width: int = 800, height: int = 600, headless: bool = False):
     _start_event.wait()
 
 
+def run_async(main_func, width: int = 800, height: int = 600, headless: bool = False):
+    """
+    Init the graphics system, run the coroutine function in an asyncio event loop, and close the graphics system
+    when it returns.
+
+    The graphics window runs in its own thread, so the asyncio event loop runs alongside it in the
+    calling thread. Use next_frame() in the coroutine to control the frame rate.
+
+    :param main_func: the coroutine function to run
+    :param width: width of the graphics window (in pixels)
+    :param height: height of the graphics window (in pixels)
+    :param headless: True to run in headless mode.
+    :return: the result of the coroutine
+    """
+    init_graph(width, height, headless)
+    try:
+        return asyncio.run(main_func())
+    finally:
+        close_graph()
+
+
 def get_graphics_window() -> GraphWin:
     """
     Get the graphics window.
@@ -2198,7 +2605,8 @@ def close_graph():
     for image in _created_images:
         image.close()
     _created_images.clear()
-    _app.quit()
+    # queue the quit, in case the app's event loop is not started yet
+    QtCore.QMetaObject.invokeMethod(_app, "quit", QtCore.Qt.QueuedConnection)
     _close_event.set()
     while _app is not None:
         time.sleep(0.05)
@@ -2276,7 +2684,7 @@ def __graphics_thread_func(width: int, height: int, headless=False):
     invoke_in_app_thread.init_invoke_in_app()
     if not _headless:
         _win = GraphWin(width, height)
-        _target_image = _win.get_canvas()
+        _target_image = _win.get_active_canvas()
         _win.show()
         set_caption("Python Easy Graphics")
         _is_run = True
@@ -1,14 +1,19 @@
+import asyncio
 import os
 import threading
 import time
+from collections import deque
 from PyQt5 import QtWidgets
 from PyQt5 import QtCore
 from PyQt5 import QtGui
 
 from easygraphics.image import Image
-from easygraphics.consts import Color, MouseMessageType
+from easygraphics.consts import Color, MouseMessageType, EventType
+from easygraphics._utils.frame_stats import FrameStats
 
-__all__ = ['GraphWin']
+__all__ = ['GraphWin', 'InputEvent']
+
+_EVENT_QUEUE_SIZE = 1024
 
 
 class GraphWin(QtWidgets.QWidget):
@@ -38,7 +43,13 @@ class GraphWin(QtWidgets.QWidget):
         self._key_msg = _KeyMsg()
         self._key_char_msg = _KeyCharMsg()
         self._mouse_msg = _MouseMsg()
+        # deque's append() and popleft() are atomic, so the gui thread and the drawing thread
+        # can share the queue without a lock. The oldest events are dropped when it's full.
+        self._events = deque(maxlen=_EVENT_QUEUE_SIZE)
+        self._frame_stats = None
+        self._show_frame_stats = False
         self.setGeometry(100, 100, width, height)
+        self.setMouseTracking(True)
         self._init_screen(width, height)
         self._is_run = True
         self._immediate = True
@@ -60,13 +71,92 @@ class GraphWin(QtWidgets.QWidget):
         screen_image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
         screen_image.fill(Color.WHITE)
         self._canvas = Image(screen_image)
+        # off-screen pages for page flipping. self._canvas is the visual page.
+        self._pages = {0: self._canvas}
+        self._active_page = 0
+        self._visual_page = 0
         self._device_image = screen_image.copy()
         self.real_update()
 
     def get_canvas(self):
         return self._canvas
 
+    def get_page(self, page: int) -> Image:
+        """
+        Get the image of the page. The page is created when it's first used.
+
+        :param page: the page number
+        :return: the image of the page
+        """
+        image = self._pages.get(page)
+        if image is None:
+            if page < 0:
+                raise ValueError("page must be >= 0!")
+            image = Image.create(self._width, self._height)
+            image.set_background_color(self._pages[0].get_background_color())
+            image.set_font(self._pages[0].get_font())
+            self._pages[page] = image
+        return image
+
+    def set_active_page(self, page: int) -> Image:
+        """
+        Set the active page, i.e. the page to draw on.
+
+        Like the BGI, the drawing settings (colors, line style, font, etc.) are carried over to the new active page.
+
+        :param page: the page number
+        :return: the image of the page
+        """
+        image = self.get_page(page)
+        if page != self._active_page:
+            old_page = self._pages[self._active_page]
+            image._copy_settings_from(old_page)
+            if self._frame_stats is not None:
+                # the drawing operations are counted on the page drawn on
+                old_page.remove_updated_listener(self._frame_stats.add_primitive)
+                image.add_updated_listener(self._frame_stats.add_primitive)
+        self._active_page = page
+        return image
+
+    def get_active_page(self) -> int:
+        return self._active_page
+
+    def get_active_canvas(self) -> Image:
+        """
+        Get the image of the active page, i.e. the page to draw on.
+
+        Note that get_canvas() returns the visual page.
+
+        :return: the image of the active page
+        """
+        return self._pages[self._active_page]
+
+    def set_visual_page(self, page: int):
+        """
+        Set the visual page, i.e. the page shown in the window.
+
+        The page is swapped in without copying.
+
+        :param page: the page number
+        """
+        image = self.get_page(page)
+        self._visual_page = page
+        if image is self._canvas:
+            return
+        old_canvas = self._canvas
+        if self._immediate:
+            old_canvas.remove_updated_listener(self.update)
+            image.add_updated_listener(self.update)
+        self._canvas = image
+        self.real_update()
+
+    def get_visual_page(self) -> int:
+        return self._visual_page
+
     def paintEvent(self, e):
+        stats = self._frame_stats
+        if stats is not None:
+            start_time = time.perf_counter_ns()
         if self._immediate:
             self._canvas.draw_to_device(self)
         else:
@@ -74,6 +164,45 @@ class GraphWin(QtWidgets.QWidget):
             p.begin(self)
             p.drawImage(0, 0, self._device_image)
             p.end()
+        if stats is not None:
+            if self._show_frame_stats:
+                p = QtGui.QPainter()
+                p.begin(self)
+                stats.draw_overlay(p)
+                p.end()
+            stats.add_paint_time(time.perf_counter_ns() - start_time)
+
+    def enable_frame_stats(self, enabled: bool = True, overlay: bool = False):
+        """
+        Turn on/off the per-frame instrumentation.
+
+        When enabled, the drawing operations on the active page, the time used by user drawing, blitting,
+        sleeping and repainting are recorded for each frame (see get_frame_stats()).
+
+        :param enabled: True to turn on, False to turn off
+        :param overlay: True to show the stats on the top-left corner of the window
+        """
+        if enabled:
+            if self._frame_stats is None:
+                self._frame_stats = FrameStats()
+                self.get_active_canvas().add_updated_listener(self._frame_stats.add_primitive)
+        elif self._frame_stats is not None:
+            self.get_active_canvas().remove_updated_listener(self._frame_stats.add_primitive)
+            self._frame_stats = None
+        self._show_frame_stats = enabled and overlay
+        self.update()
+
+    def get_frame_stats(self) -> dict:
+        """
+        Get the per-frame instrumentation data.
+
+        See FrameStats.get_stats().
+
+        :return: the stats dict
+        """
+        if self._frame_stats is None:
+            raise RuntimeError("Frame stats is not enabled! Call enable_frame_stats() first!")
+        return self._frame_stats.get_stats()
 
     def set_immediate(self, immediate: bool):
         """
@@ -97,6 +226,8 @@ class GraphWin(QtWidgets.QWidget):
     def close(self):
         if self._immediate:
             self._canvas.remove_updated_listener(self.update)
+        for page in self._pages.values():
+            page.close()
 
     def is_immediate(self) -> bool:
         """
@@ -110,10 +241,21 @@ class GraphWin(QtWidgets.QWidget):
         self._wait_event.set()
         self._mouse_msg.set_event(e, MouseMessageType.PRESS_MESSAGE)
         self._mouse_event.set()
+        self._events.append(InputEvent.from_mouse_event(EventType.MOUSE_PRESS, e))
 
     def mouseReleaseEvent(self, e: QtGui.QMouseEvent):
         self._mouse_msg.set_event(e, MouseMessageType.RELEASE_MESSAGE)
         self._mouse_event.set()
+        self._events.append(InputEvent.from_mouse_event(EventType.MOUSE_RELEASE, e))
+
+    def mouseMoveEvent(self, e: QtGui.QMouseEvent):
+        self._events.append(InputEvent.from_mouse_event(EventType.MOUSE_MOVE, e))
+
+    def wheelEvent(self, e: QtGui.QWheelEvent):
+        self._events.append(InputEvent.from_wheel_event(e))
+
+    def keyReleaseEvent(self, e: QtGui.QKeyEvent):
+        self._events.append(InputEvent.from_key_event(EventType.KEY_RELEASE, e))
 
     def keyPressEvent(self, e: QtGui.QKeyEvent):
         self._wait_event.set()
@@ -130,6 +272,7 @@ class GraphWin(QtWidgets.QWidget):
             self._char_key_event.set()
         self._key_msg.set_event(e)
         self._key_event.set()
+        self._events.append(InputEvent.from_key_event(EventType.KEY_PRESS, e))
 
     def pause(self):
         """
@@ -157,9 +300,32 @@ class GraphWin(QtWidgets.QWidget):
 
         the intermediary image (self._device_image) is synced with the canvas
         """
-        self._canvas.draw_to_device(self._device_image)
+        stats = self._frame_stats
+        if stats is None:
+            self._canvas.draw_to_device(self._device_image)
+        else:
+            start_time = time.perf_counter_ns()
+            self._canvas.draw_to_device(self._device_image)
+            stats.add_blit_time(time.perf_counter_ns() - start_time)
         self.update()
 
+    def _sleep(self, microseconds: int):
+        stats = self._frame_stats
+        if stats is None:
+            QtCore.QThread.usleep(microseconds)
+        else:
+            start_time = time.perf_counter_ns()
+            QtCore.QThread.usleep(microseconds)
+            stats.add_sleep_time(time.perf_counter_ns() - start_time)
+
+    def _draw_finished(self):
+        if self._frame_stats is not None:
+            self._frame_stats.draw_finished()
+
+    def _end_frame(self, skipped: bool = False):
+        if self._frame_stats is not None:
+            self._frame_stats.end_frame(skipped)
+
     def delay(self, milliseconds: float):
         """
         Delay the program for specified milliseconds.
@@ -170,11 +336,13 @@ class GraphWin(QtWidgets.QWidget):
             raise RuntimeError("Must set render mode to MANUAL to use delay()!")
         if not self._is_run:
             return
+        self._draw_finished()
         self.real_update()
         nanotime = milliseconds * 1000000
         start_wait_time = time.perf_counter_ns()
         if time.perf_counter_ns() - start_wait_time < nanotime:
-            QtCore.QThread.usleep((start_wait_time + nanotime - time.perf_counter_ns()) // 1000)
+            self._sleep((start_wait_time + nanotime - time.perf_counter_ns()) // 1000)
+        self._end_frame()
 
     def delay_fps(self, fps: int) -> bool:
         """
@@ -187,15 +355,45 @@ class GraphWin(QtWidgets.QWidget):
             raise RuntimeError("Must set render mode to MANUAL to use delay()!")
         if not self._is_run:
             return False
+        sleep_time = self._begin_fps_wait(fps)
+        if sleep_time > 0:
+            self._sleep(sleep_time)
+        self._end_fps_wait()
+        return True
+
+    async def next_frame(self, fps: int) -> bool:
+        """
+        Coroutine version of delay_fps(). Wait for the next frame without blocking the asyncio event loop.
+
+        :param fps: the desire fps
+        :return: False the graphics window is closed. True otherwise.
+        """
+        if self._immediate:
+            raise RuntimeError("Must set render mode to MANUAL to use delay()!")
+        if not self._is_run:
+            return False
+        sleep_time = self._begin_fps_wait(fps)
+        stats = self._frame_stats
+        start_time = time.perf_counter_ns()
+        # always yield once, so other tasks can run even if the frame is late
+        await asyncio.sleep(max(sleep_time, 0) / 1000000)
+        if stats is not None:
+            stats.add_sleep_time(time.perf_counter_ns() - start_time)
+        self._end_fps_wait()
+        return self._is_run
+
+    def _begin_fps_wait(self, fps: int) -> int:
+        """ finish drawing the frame and update the window. return the microseconds to wait for the next frame """
+        self._draw_finished()
         nanotime = 1000000000 // fps
         if self._last_fps_time == 0:
             self._last_fps_time = time.perf_counter_ns()
         self.real_update()
-        tt = time.perf_counter_ns()
-        if tt - self._last_fps_time < nanotime:
-            QtCore.QThread.usleep((self._last_fps_time + nanotime - tt) // 1000)
+        return (self._last_fps_time + nanotime - time.perf_counter_ns()) // 1000
+
+    def _end_fps_wait(self):
         self._last_fps_time = time.perf_counter_ns()
-        return True
+        self._end_frame()
 
     def delay_jfps(self, fps: int, max_skip_count: int = 10) -> bool:
         """
@@ -211,10 +409,12 @@ class GraphWin(QtWidgets.QWidget):
             raise RuntimeError("Must set render mode to MANUAL to use delay()!")
         if not self._is_run:
             return False
+        self._draw_finished()
         nanotime = 1000000000 // fps
         if self._frames_to_skip_count > 0:
             self._frames_to_skip_count -= 1
             self._frames_skipped += 1
+            self._end_frame(True)
             return False
         if self._last_fps_time == 0:
             self._last_fps_time = time.perf_counter_ns()
@@ -227,11 +427,13 @@ class GraphWin(QtWidgets.QWidget):
                 if max_skip_count <= 0:
                     self._frames_to_skip_count -= 1
                     self._last_fps_time = time.perf_counter_ns()
+                    self._end_frame(True)
                     return False
                 elif self._frames_to_skip_count > max_skip_count - self._frames_skipped:
                     self._frames_to_skip_count = (max_skip_count - self._frames_skipped) - 1
                     self._frames_skipped += 1
                     self._last_fps_time = time.perf_counter_ns()
+                    self._end_frame(True)
                     return False
             else:
                 self._frames_skipped = 0
@@ -239,8 +441,9 @@ class GraphWin(QtWidgets.QWidget):
         tt = time.perf_counter_ns()
         sleep_time = (self._last_fps_time + nanotime - tt) // 1000
         if sleep_time > 0:
-            QtCore.QThread.usleep(sleep_time)
+            self._sleep(sleep_time)
         self._last_fps_time = time.perf_counter_ns()
+        self._end_frame()
         return True
 
     def get_char(self) -> str:
@@ -344,6 +547,25 @@ class GraphWin(QtWidgets.QWidget):
         nt = time.perf_counter_ns()
         return nt - self._mouse_msg.get_time() <= 100000000
 
+    def poll_events(self) -> list:
+        """
+        Get all the pending input events (key press/release, mouse press/release/move and wheel), and
+        remove them from the event queue.
+
+        It never blocks and never updates the window, so it can be called in each frame of an animation.
+        The queue keeps at most the latest 1024 events.
+
+        :return: list of InputEvent, the oldest first
+        """
+        events = []
+        queue = self._events
+        try:
+            while True:
+                events.append(queue.popleft())
+        except IndexError:
+            pass
+        return events
+
     def get_cursor_pos(self) -> (int, int):
         """
         Get position of the mouse cursor
@@ -354,6 +576,55 @@ class GraphWin(QtWidgets.QWidget):
         return p.x(), p.y()
 
 
+class InputEvent:
+    """
+    An input event in the event queue (see GraphWin.poll_events()).
+
+    * **type**: the event type (see EventType)
+    * **x**, **y**: the cursor position of mouse events (0 for key events)
+    * **button**: the button that caused a mouse press/release event
+    * **buttons**: the mouse buttons down when the event happened
+    * **key**, **text**: the key code and the inputted text of key events
+    * **modifiers**: the keyboard modifiers
+    * **delta**: the rotated angle (in eighths of a degree) of wheel events
+    * **timestamp**: the time (in milliseconds) the event happened, given by the window system
+    """
+    __slots__ = ('type', 'x', 'y', 'button', 'buttons', 'key', 'text', 'modifiers', 'delta', 'timestamp')
+
+    def __init__(self, type: int, x: int = 0, y: int = 0, button: int = QtCore.Qt.NoButton,
+                 buttons: int = QtCore.Qt.NoButton, key: int = 0, text: str = '',
+                 modifiers: int = QtCore.Qt.NoModifier, delta: int = 0, timestamp: int = 0):
+        self.type = type
+        self.x = x
+        self.y = y
+        self.button = button
+        self.buttons = buttons
+        self.key = key
+        self.text = text
+        self.modifiers = modifiers
+        self.delta = delta
+        self.timestamp = timestamp
+
+    @staticmethod
+    def from_mouse_event(type: int, e: QtGui.QMouseEvent) -> "InputEvent":
+        return InputEvent(type, e.x(), e.y(), button=e.button(), buttons=e.buttons(), modifiers=e.modifiers(),
+                          timestamp=e.timestamp())
+
+    @staticmethod
+    def from_wheel_event(e: QtGui.QWheelEvent) -> "InputEvent":
+        pos = e.pos()
+        return InputEvent(EventType.MOUSE_WHEEL, pos.x(), pos.y(), buttons=e.buttons(), modifiers=e.modifiers(),
+                          delta=e.angleDelta().y(), timestamp=e.timestamp())
+
+    @staticmethod
+    def from_key_event(type: int, e: QtGui.QKeyEvent) -> "InputEvent":
+        return InputEvent(type, key=e.key(), text=e.text(), modifiers=e.modifiers(), timestamp=e.timestamp())
+
+    def __repr__(self):
+        return "InputEvent(type={}, x={}, y={}, button={}, key={}, text={!r}, delta={}, timestamp={})".format(
+            self.type, self.x, self.y, int(self.button), self.key, self.text, self.delta, self.timestamp)
+
+
 class _KeyMsg:
     """
     class for saving keyboard message
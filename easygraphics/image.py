@@ -1,11 +1,14 @@
-from collections import deque
+from collections import deque, OrderedDict
 from typing import Union, Callable
 import math
+import mmap
 
-from PyQt5 import QtGui, QtCore
+from PyQt5 import QtGui, QtCore, sip
 
-from easygraphics.consts import FillStyle, Color, LineStyle, CompositionMode, FillRule, ShapeMode, VertexType
+from easygraphics.consts import FillStyle, Color, LineStyle, CompositionMode, FillRule, ShapeMode, VertexType, \
+    SplineType, RenderQuality
 import qimage2ndarray as qn
+import numpy as np
 
 _in_ipython = False
 try:
@@ -31,7 +34,7 @@ class Image:
     with set_background_color() and draw_image(with_background=False).
     """
 
-    def __init__(self, image: QtGui.QImage):
+    def __init__(self, image: QtGui.QImage, mask: QtGui.QImage = None):
         self._image = image
         self._image_view = qn.raw_view(image)
         self._color = _to_qcolor(Color.BLACK)
@@ -41,9 +44,11 @@ class Image:
         self._fill_style = FillStyle.SOLID_FILL
         self._fill_rule = FillRule.ODD_EVEN_FILL
         self._background_color = _to_qcolor(Color.WHITE)
-        self._mask = QtGui.QImage(image.width(), image.height(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        if mask is None:
+            mask = QtGui.QImage(image.width(), image.height(), _MASK_FORMAT)
+        self._mask = mask
         self._mask_view = qn.raw_view(self._mask)
-        self._mask.fill(MASK_WHITE)
+        self._mask.fill(_MASK_WHITE_RAW)
         self._pen = QtGui.QPen()
         self._pen.setColor(Color.BLACK)
         self._pen.setCapStyle(QtCore.Qt.RoundCap)
@@ -59,36 +64,36 @@ class Image:
         self._init_mask_painter()
         self._updated_listeners = []
         self._transform_stack = []
+        # cached world transform. None means it must be read from the painter again
+        self._transform = None
         self._rect_mode = ShapeMode.CORNERS
         self._ellipse_mode = ShapeMode.RADIUS
-        self._old_flip_y = False
-        self._old_rect_mode = ShapeMode.CORNERS
-        self._old_ellipse_mode = ShapeMode.RADIUS
-        self._old_color = _to_qcolor(Color.BLACK)
-        self._old_line_style = LineStyle.SOLID_LINE
-        self._old_line_width = 1
-        self._old_fill_color = _to_qcolor(Color.WHITE)
-        self._old_fill_style = FillStyle.SOLID_FILL
-        self._old_fill_rule = FillRule.ODD_EVEN_FILL
-        self._old_background_color = _to_qcolor(Color.WHITE)
+        self._settings_stack = []
+        self._font_info = None
+        self._static_texts = OrderedDict()
+        self._version = 0
+        self._foregrounds = {}
+        self._mapped_buffers = []
         self._shape_path = None
         self._shape_vertext_type = VertexType.POLY_LINE
         self._shape_vertices = []
         self._shape_transformed_vertices = []
+        self._shape_colors = []
         self._is_curve_shape = False
 
     def _init_painter(self):
         p = self._painter
         p.begin(self._image)
         p.setCompositionMode(CompositionMode.SOURCE_OVER)
-        # p.setRenderHint(QtGui.QPainter.Antialiasing) # flood fill will not work when anti-aliasing is on
+        # shapes are aliased by default, see set_render_quality()
         self._default_rect = p.viewport()
 
     def _init_mask_painter(self):
         p = self._mask_painter
         p.begin(self._mask)
         p.setCompositionMode(CompositionMode.SOURCE)
-        # p.setRenderHint(QtGui.QPainter.Antialiasing) # flood fill will not work when anti-aliasing is on
+        # shapes are always aliased on the mask (see set_render_quality()). Texts keep Qt's default
+        # anti-aliasing, so their edges are kept in the foreground.
 
     def get_image(self) -> QtGui.QImage:
         """
@@ -240,8 +245,8 @@ class Image:
 
         background_color = _to_qcolor(background_color)
         self._background_color = background_color
-        foreground = _get_foreground(self)
-        self._image.fill(background_color)
+        foreground, mask = _get_foreground(self)
+        _fill_image(self._image, background_color)
         self._painter.save()
         self._painter.resetTransform()
         self._painter.setCompositionMode(CompositionMode.SOURCE_OVER)
@@ -411,6 +416,7 @@ class Image:
         """
         self._painter.translate(offset_x, offset_y)
         self._mask_painter.translate(offset_x, offset_y)
+        self._transform_changed()
 
     def rotate(self, degree: float, x: float = 0, y: float = 0):
         """
@@ -423,6 +429,7 @@ class Image:
         self.translate(x, y)
         self._painter.rotate(degree)
         self._mask_painter.rotate(degree)
+        self._transform_changed()
         self.translate(-x, -y)
 
     def scale(self, sx: float, sy: float):
@@ -434,6 +441,7 @@ class Image:
         """
         self._painter.scale(sx, sy)
         self._mask_painter.scale(sx, sy)
+        self._transform_changed()
 
     def shear(self, sh: float, sv: float, x: float = 0, y: float = 0):
         """
@@ -447,6 +455,7 @@ class Image:
         self.translate(x, y)
         self._painter.shear(sh, sv)
         self._mask_painter.shear(sh, sv)
+        self._transform_changed()
         self.translate(-x, -y)
 
     skew = shear
@@ -470,6 +479,7 @@ class Image:
         transform = self._get_reflect_transform(x - x1, y - y1)
         self._painter.setTransform(transform, True)
         self._mask_painter.setTransform(transform, True)
+        self._transform_changed()
         self.translate(-x1, -y1)
 
     @staticmethod
@@ -511,8 +521,22 @@ class Image:
 
         :return: the transform matrix
         """
+        # read from the painter, in case it's transformed directly (see get_painter())
         return self._painter.transform()
 
+    def _get_transform(self) -> QtGui.QTransform:
+        """
+        get the cached world transform for the drawing methods. Don't modify the returned object.
+
+        The cache is cleared by the transform methods and get_painter().
+        """
+        if self._transform is None:
+            self._transform = self._painter.transform()
+        return self._transform
+
+    def _transform_changed(self):
+        self._transform = None
+
     def set_transform(self, transform: QtGui.QTransform):
         """
         Set image's transform matrix.
@@ -521,6 +545,7 @@ class Image:
         """
         self._painter.setTransform(transform)
         self._mask_painter.setTransform(transform)
+        self._transform_changed()
 
     def push_transform(self):
         """
@@ -536,6 +561,8 @@ class Image:
             raise RuntimeError("No more transforms to pop!")
         transform = self._transform_stack.pop()
         self.set_transform(transform)
+        # the saved transforms are never modified, so it can be used as the cache directly
+        self._transform = transform
 
     def reset_transform(self):
         """
@@ -543,6 +570,26 @@ class Image:
         """
         self._painter.resetTransform()
         self._mask_painter.resetTransform()
+        self._transform_changed()
+
+    def map_points(self, points) -> np.ndarray:
+        """
+        Map the points with the current transform, i.e. get their coordinates on the image.
+
+        All the points are mapped in one numpy matrix multiply.
+
+        :param points: (N,2) array (or list of (x, y) pairs, or a flat list x0, y0, x1, y1, ...) of the points
+        :return: (N,2) array of the mapped points
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        t = self._painter.transform()
+        matrix = np.array([[t.m11(), t.m12(), t.m13()],
+                           [t.m21(), t.m22(), t.m23()],
+                           [t.m31(), t.m32(), t.m33()]])
+        mapped = points @ matrix[:2] + matrix[2]
+        if t.isAffine():
+            return mapped[:, :2]
+        return mapped[:, :2] / mapped[:, 2:]
 
     def clear_view_port(self):
         """
@@ -578,6 +625,33 @@ class Image:
         """
         return self._painter.compositionMode()
 
+    def set_render_quality(self, quality: int):
+        """
+        Set the render quality of the image.
+
+        RenderQuality.HIGH draws anti-aliased shapes, which look smoother but are slower to draw.
+        Batch jobs can use RenderQuality.LOW to draw faster.
+
+        :param quality: the render quality preset (see RenderQuality)
+        """
+        if quality not in _RENDER_HINTS:
+            raise ValueError("Unknown render quality: {}".format(quality))
+        self._painter.setRenderHints(_ALL_RENDER_HINTS, False)
+        self._painter.setRenderHints(_RENDER_HINTS[quality])
+
+    def get_render_quality(self) -> int:
+        """
+        Get the render quality of the image.
+
+        :return: the render quality preset (see RenderQuality)
+        """
+        p = self._painter
+        if p.testRenderHint(QtGui.QPainter.Antialiasing):
+            return RenderQuality.HIGH
+        if p.testRenderHint(QtGui.QPainter.TextAntialiasing):
+            return RenderQuality.NORMAL
+        return RenderQuality.LOW
+
     def move_to(self, x, y):
         """
         Set the drawing position to (x,y).
@@ -964,22 +1038,37 @@ class Image:
 
     bezier = draw_bezier
 
-    def draw_curve(self, *points):
+    def draw_curve(self, *points, spline_type: int = SplineType.CATMULL_ROM, tolerance: float = 0):
         """
-        Draw a Catmull-Rom spline.
+        Draw a spline.
+
+        The control points can be given as numbers (x0, y0, x1, y1, ...), or as one (N,2) numpy array
+        (or a list of (x, y) pairs). The whole spline is drawn as one path, so long curves are drawn
+        in one call without visible joins.
+
+        For Catmull-Rom splines, the curve goes from the second to the second last control point.
 
         :param points: control points
-        """
-        if len(points) < 8:
-            raise RuntimeError("must have at least 4 control points to draw Catmull-Rom curve!")
-        for i in range(7, len(points), 2):
-            x0, y0 = points[i - 5], points[i - 4]
-            x1 = -points[i - 7] / 6 + points[i - 5] + points[i - 3] / 6
-            y1 = -points[i - 6] / 6 + points[i - 4] + points[i - 2] / 6
-            x2 = points[i - 5] / 6 + points[i - 3] - points[i - 1] / 6
-            y2 = points[i - 4] / 6 + points[i - 2] - points[i] / 6
-            x3, y3 = points[i - 3], points[i - 2]
-            self.draw_bezier(x0, y0, x1, y1, x2, y2, x3, y3)
+        :param spline_type: kind of the spline (see SplineType)
+        :param tolerance: if > 0, the curve is flattened to a polyline, whose distance to the curve is
+            less than the tolerance (in pixels). It's faster for long curves. 0 means draw the exact curve.
+        """
+        points = _curve_points(points)
+        if len(points) < 4:
+            raise RuntimeError("must have at least 4 control points to draw the spline curve!")
+        starts, controls1, controls2, ends = _spline_to_beziers(points, spline_type)
+        p = self._prepare_painter_for_draw_outline()
+        if tolerance > 0:
+            polyline = _array_to_qpolygon(_flatten_beziers(starts, controls1, controls2, ends, tolerance))
+            p.drawPolyline(polyline)
+            self._mask_painter.drawPolyline(polyline)
+        else:
+            path = QtGui.QPainterPath(QtCore.QPointF(*starts[0]))
+            for c1, c2, end in zip(controls1.tolist(), controls2.tolist(), ends.tolist()):
+                path.cubicTo(c1[0], c1[1], c2[0], c2[1], end[0], end[1])
+            p.drawPath(path)
+            self._mask_painter.drawPath(path)
+        self._updated()
 
     curve = draw_curve
 
@@ -1132,6 +1221,38 @@ class Image:
         self._mask_painter.drawPolygon(polygon, self._fill_rule)
         self._updated()
 
+    def draw_polygons(self, polygons, colors=None):
+        """
+        Draw many polygons in one call.
+
+        "polygons" is a (M,K,2) array (or nested list) of M polygons, each with K vertices. The polygons
+        are drawn in order (filled and with outline), so the later ones cover the former ones.
+
+        It's much faster than calling draw_polygon() for each polygon.
+
+        :param polygons: the polygons' vertices
+        :param colors: list of the fill colors of each polygon. None means use the current fill color.
+        """
+        polygons = np.asarray(polygons, dtype=np.float64)
+        if len(polygons) == 0:
+            return
+        if polygons.ndim != 3 or polygons.shape[2] != 2:
+            raise ValueError("polygons must be a (M,K,2) array!")
+        if colors is not None and len(colors) != len(polygons):
+            raise ValueError("colors and polygons must have the same length!")
+        p = self._prepare_painter_for_draw()
+        brush = QtGui.QBrush(self._brush)
+        for i in range(len(polygons)):
+            if colors is not None:
+                brush.setColor(_to_qcolor(colors[i]))
+                p.setBrush(brush)
+            polygon = _array_to_qpolygon(polygons[i])
+            p.drawPolygon(polygon, self._fill_rule)
+            self._mask_painter.drawPolygon(polygon, self._fill_rule)
+        if colors is not None:
+            p.setBrush(self._brush)
+        self._updated()
+
     def path(self, path: QtGui.QPainterPath):
         """
         Draw a path.
@@ -1280,8 +1401,8 @@ class Image:
         """
         Clear the image to show the background.
         """
-        self._image.fill(self._background_color)
-        self._mask.fill(MASK_WHITE)
+        _fill_image(self._image, self._background_color)
+        self._mask.fill(_MASK_WHITE_RAW)
         self._updated()
 
     def fill_image(self, color):
@@ -1331,31 +1452,85 @@ class Image:
         if composition_mode is not None:
             old_mode = p.compositionMode()
             p.setCompositionMode(composition_mode)
-        img = _prepare_image_for_copy(image, with_background)
-        p.drawImage(x, y, img, src_x, src_y, src_width, src_height)
-        self._mask_painter.fillRect(x, y, src_width, src_height, QtCore.Qt.color0)
+        self._draw_sprite(x, y, image, _calc_src_rect(image, src_x, src_y, src_width, src_height), with_background)
         if composition_mode is not None:
             p.setCompositionMode(old_mode)
         self._updated()
 
+    def draw_sprites(self, image: "Image", sprites, with_background=True, composition_mode=None):
+        """
+        Draw many parts of the source image (a sprite sheet) in one call.
+
+        "sprites" is a list of (x, y) or (x, y, src_rect). (x, y) is the top-left point in the destination
+        image that is to be drawn onto, src_rect is (src_x, src_y, src_width, src_height), the part of the source
+        image to be drawn. If src_rect is missing or None, the whole source image is drawn. See draw_image().
+
+        The foregrounds of the source image are cached until the source image is changed, so drawing
+        sprites without background is as fast as with background.
+
+        :param image: the source image (sprite sheet)
+        :param sprites: list of (x, y, src_rect)
+        :param with_background: if the background should be copied.
+        :param composition_mode: if is None, use dst image's composition mode to copy.
+        """
+        p = self._painter
+        old_mode = CompositionMode.SOURCE_OVER
+        if composition_mode is not None:
+            old_mode = p.compositionMode()
+            p.setCompositionMode(composition_mode)
+        whole_rect = image.get_image().rect()
+        for sprite in sprites:
+            if len(sprite) > 2 and sprite[2] is not None:
+                rect = _calc_src_rect(image, *sprite[2])
+            else:
+                rect = whole_rect
+            self._draw_sprite(sprite[0], sprite[1], image, rect, with_background)
+        if composition_mode is not None:
+            p.setCompositionMode(old_mode)
+        self._updated()
+
+    def _draw_sprite(self, x: int, y: int, image: "Image", rect: QtCore.QRect, with_background: bool):
+        """ draw the rect part of the source image, and update the mask only where it's drawn """
+        if rect.isEmpty():
+            return
+        if with_background:
+            self._painter.drawImage(x, y, image.get_image(), rect.x(), rect.y(), rect.width(), rect.height())
+            self._mask_painter.fillRect(x, y, rect.width(), rect.height(), MASK_BLACK)
+        else:
+            foreground, mask = _get_foreground(image, rect)
+            self._painter.drawImage(x, y, foreground)
+            # the mask painter uses SOURCE mode, blend to keep the mask under the transparent pixels
+            self._mask_painter.setCompositionMode(CompositionMode.SOURCE_OVER)
+            self._mask_painter.drawImage(x, y, mask)
+            self._mask_painter.setCompositionMode(CompositionMode.SOURCE)
+
     def get_mask(self) -> QtGui.QImage:
         """
         Get background mask image.
 
+        The mask is a QImage.Format_Grayscale8 image (one byte per pixel): 255 is background, 0 is drawn.
+        Before version 1.0.11 it was an ARGB32 premultiplied image. Code that needs the old format can
+        convert it: image.get_mask().convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+
         :return: background mask
         """
         return self._mask
 
-    def draw_to_device(self, device: QtGui.QPaintDevice):
+    def draw_to_device(self, device: QtGui.QPaintDevice, rect: QtCore.QRect = None):
         """
-        Draw the whole image to the specified device.
+        Draw the whole image (or a part of it) to the specified device.
 
         :param device: the device to be drawn on
+        :param rect: the part of the image to draw (i.e. the exposed rect of a paint event).
+            None means the whole image.
         """
         p = QtGui.QPainter()
         p.begin(device)
         p.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
-        p.drawImage(0, 0, self._image)
+        if rect is None:
+            p.drawImage(0, 0, self._image)
+        else:
+            p.drawImage(rect, self._image, rect)
         p.end()
 
     def flood_fill(self, x: int, y: int, border_color):
@@ -1370,38 +1545,73 @@ class Image:
         """
         if self._fill_style == FillStyle.NULL_FILL:  # no need to fill
             return
-        queue = deque()
         transform = self._painter.combinedTransform()
         new_pos = transform.map(QtCore.QPoint(x, y))
-        queue.append((new_pos.x(), new_pos.y()))
-        bc = _to_qcolor(border_color).rgba()
-        fc = _to_qcolor(self._fill_color).rgba()
-        flags = [0] * (self._image.width() * self._image.height())
+        width = self._image.width()
+        height = self._image.height()
+        if not (0 <= new_pos.x() < width and 0 <= new_pos.y() < height):
+            return
         r = None
         if self._painter.hasClipping():
             r = self._painter.clipBoundingRect()
             r = transform.mapRect(r)
-        self._mask_painter.setPen(QtCore.Qt.color0)
+        # visited pixels and borders are both marked 1, so the loop only test one bytearray
+        blocked = bytearray(np.ascontiguousarray(self._get_fill_borders(new_pos.x(), new_pos.y(),
+                                                                        border_color)).tobytes())
+        filled = bytearray(width * height)
+        queue = deque()
+        queue.append((new_pos.x(), new_pos.y()))
         while len(queue) > 0:
             x, y = queue.popleft()
-            if x < 0 or y < 0 or x >= self._image.width() or y >= self._image.height():
+            if x < 0 or y < 0 or x >= width or y >= height:
                 continue
             if r is not None and not r.contains(x, y):
                 continue
-            if flags[self._image.width() * y + x] == 1:
+            i = width * y + x
+            if blocked[i]:
                 continue
-            pc = self._image.pixel(x, y)
-            if bc == pc:
-                continue
-            flags[self._image.width() * y + x] = 1
-            self._image_view[y, x] = fc
-            self._mask_view[y, x] = MASK_BLACK.rgba()
+            blocked[i] = 1
+            filled[i] = 1
             queue.append((x + 1, y))
             queue.append((x - 1, y))
             queue.append((x, y + 1))
             queue.append((x, y - 1))
+        filled = np.frombuffer(filled, dtype=np.bool_).reshape(height, width)
+        self._image_view[filled] = _pixel_values(self._image.format(), self._fill_color)[1]
+        self._mask_view[filled] = _MASK_BLACK_RAW
         self._updated()
 
+    def _get_fill_borders(self, x: int, y: int, border_color) -> np.ndarray:
+        """
+        Get the border pixels of the flood fill started from (x,y) (in device coordinates).
+
+        When shapes are anti-aliased, the borders are blended with the pixels under them. So the pixels
+        near the mask's drawn pixels, whose colors are moved from the start pixel color towards
+        the border color, are borders too.
+        """
+        view = self._image_view
+        bc = _pixel_values(self._image.format(), border_color)[1]
+        borders = view == bc
+        if not self._painter.testRenderHint(QtGui.QPainter.Antialiasing):
+            return borders
+        pixels = _pixel_channels(view).astype(np.float32)
+        start = pixels[y, x].copy()
+        direction = _pixel_channels(np.array([[bc]], dtype=view.dtype))[0, 0] - start
+        length = np.dot(direction, direction)
+        if length == 0:
+            return borders
+        pixels -= start
+        blended = pixels @ (direction / length) >= _BLENDED_BORDER_COVERAGE
+        # aliased and anti-aliased drawings may be half a pixel apart
+        # anti-aliased text edges are gray on the mask
+        drawn = self._mask_view != _MASK_WHITE_RAW
+        near_drawn = drawn.copy()
+        near_drawn[1:] |= drawn[:-1]
+        near_drawn[:-1] |= drawn[1:]
+        near_drawn[:, 1:] |= drawn[:, :-1]
+        near_drawn[:, :-1] |= drawn[:, 1:]
+        return borders | (blended & near_drawn)
+
     def get_pixel(self, x: int, y: int) -> QtGui.QColor:
         """
         Get a pixel's color on the specified image.
@@ -1421,8 +1631,8 @@ class Image:
         :param color: the color
         """
         qcolor = _to_qcolor(color)
-        self._image.setPixel(x, y, qcolor.rgba())
-        self._mask.setPixel(x, y, MASK_BLACK.rgba())
+        self._image.setPixelColor(x, y, qcolor)
+        self._mask.setPixelColor(x, y, MASK_BLACK)
         self._updated()
 
     def draw_text(self, x: int, y: int, *args, sep=' '):
@@ -1438,17 +1648,25 @@ class Image:
         msg = sep.join(msgs)
         p = self._prepare_painter_for_draw()
         if self._flip_y:
-            transform = self._painter.transform()
+            transform = self._get_transform()
             self.reflect(1, 0)
             y = -(y - self.text_height())
-            p.drawText(x, y, msg)
-            self._mask_painter.drawText(x, y, msg)
-            self._painter.setTransform(transform)
-            self._mask_painter.setTransform(transform)
+            self._draw_text(p, x, y, msg)
+            self.set_transform(transform)
+        else:
+            self._draw_text(p, x, y, msg)
+        self._updated()
+
+    def _draw_text(self, p, x, y, msg):
+        if _is_simple_text(msg):
+            # (x,y) is on the baseline, but static texts are positioned by their top-left corner
+            static_text = self._get_static_text(msg)
+            point = QtCore.QPointF(x, y - self._get_font_metrics().ascent())
+            p.drawStaticText(point, static_text)
+            self._mask_painter.drawStaticText(point, static_text)
         else:
             p.drawText(x, y, msg)
             self._mask_painter.drawText(x, y, msg)
-        self._updated()
 
     def draw_rect_text(self, x: int, y: int, width: int, height: int, flags=QtCore.Qt.AlignCenter, *args, sep=' '):
         """
@@ -1468,28 +1686,99 @@ class Image:
         msg = sep.join(msgs)
         p = self._prepare_painter_for_draw()
         if self._flip_y:
-            transform = self._painter.transform()
+            transform = self._get_transform()
             self.reflect(1, 0)
             y = -(y + height)
-            p.drawText(x, y, width, height, flags, msg)
-            self._mask_painter.drawText(x, y, width, height, flags, msg)
-            self._painter.setTransform(transform)
-            self._mask_painter.setTransform(transform)
+            self._draw_rect_text(p, x, y, width, height, flags, msg)
+            self.set_transform(transform)
         else:
-            p.drawText(x, y, width, height, flags, msg)
-            self._mask_painter.drawText(x, y, width, height, flags, msg)
+            self._draw_rect_text(p, x, y, width, height, flags, msg)
         self._updated()
 
+    def _draw_rect_text(self, p, x, y, width, height, flags, msg):
+        int_flags = int(flags)
+        if _is_simple_text(msg) and (int_flags & ~_STATIC_TEXT_FLAGS) == 0:
+            static_text = self._get_static_text(msg)
+            size = static_text.size()
+            # only use the static text if no wrapping or clipping is needed
+            if size.width() <= width and size.height() <= height:
+                if int_flags & QtCore.Qt.AlignRight:
+                    x += width - size.width()
+                elif int_flags & QtCore.Qt.AlignHCenter:
+                    x += (width - size.width()) / 2
+                if int_flags & QtCore.Qt.AlignBottom:
+                    y += height - size.height()
+                elif int_flags & QtCore.Qt.AlignVCenter:
+                    y += (height - size.height()) / 2
+                point = QtCore.QPointF(x, y)
+                p.drawStaticText(point, static_text)
+                self._mask_painter.drawStaticText(point, static_text)
+                return
+        p.drawText(x, y, width, height, flags, msg)
+        self._mask_painter.drawText(x, y, width, height, flags, msg)
+
+    def _get_font_info(self) -> (str, QtGui.QFont, QtGui.QFontMetrics):
+        if self._font_info is None:
+            font = self._painter.font()
+            self._font_info = (font.key(), font, self._painter.fontMetrics())
+        return self._font_info
+
+    def _get_font_metrics(self) -> QtGui.QFontMetrics:
+        return self._get_font_info()[2]
+
+    def _get_static_text(self, text: str) -> QtGui.QStaticText:
+        """
+        Get the laid out static text from the LRU cache.
+
+        Colors are not part of the key, because the static text is drawn with the painter\'s pen.
+        """
+        font_key, font, _ = self._get_font_info()
+        key = (font_key, text)
+        static_text = self._static_texts.get(key)
+        if static_text is not None:
+            self._static_texts.move_to_end(key)
+            return static_text
+        static_text = QtGui.QStaticText(text)
+        static_text.setTextFormat(QtCore.Qt.PlainText)
+        static_text.prepare(QtGui.QTransform(), font)
+        self._static_texts[key] = static_text
+        if len(self._static_texts) > _STATIC_TEXT_CACHE_SIZE:
+            self._static_texts.popitem(last=False)
+        return static_text
+
     def begin_shape(self, type=VertexType.POLY_LINE):
+        """
+        Begin to define a shape.
+
+        The vertices are kept in a buffer, and the whole shape is drawn in one batch when end_shape() is called.
+
+        :param type: type of the shape's vertices (see VertexType)
+        """
         if self._shape_path is not None:
             raise RuntimeError("a shape is drawing, end it first!")
         self._shape_vertext_type = type
         self._shape_path = QtGui.QPainterPath()
         self._shape_vertices.clear()
         self._shape_transformed_vertices.clear()
+        self._shape_colors.clear()
         self._is_curve_shape = False
 
+    def _add_shape_vertex(self, x: float, y: float) -> (float, float):
+        self._shape_vertices.append(x)
+        self._shape_vertices.append(y)
+        # map(int, int) would round the result, so always use the float version
+        x, y = self._get_transform().map(float(x), float(y))
+        self._shape_transformed_vertices.append(x)
+        self._shape_transformed_vertices.append(y)
+        return x, y
+
     def curve_vertex(self, x: float, y: float):
+        """
+        Define a Catmull-Rom curve vertex of the shape.
+
+        :param x: x coordinate of the vertex
+        :param y: y coordinate of the vertex
+        """
         if len(self._shape_vertices) == 0:
             if self._shape_vertext_type == VertexType.POLY_LINE:
                 self._is_curve_shape = True
@@ -1497,88 +1786,37 @@ class Image:
                 raise RuntimeError("curve vertex must begin_shape() with VertexType.PLOY_LINE!")
         if len(self._shape_vertices) > 0 and not self._is_curve_shape:
             raise RuntimeError("curve vertex must be the first vertex call after begin_shape")
-        self._shape_vertices.append(x)
-        self._shape_vertices.append(y)
-        transform = self.get_transform()
-        point = transform.map(QtCore.QPointF(x, y))
-        self._shape_transformed_vertices.append(point.x())
-        self._shape_transformed_vertices.append(point.y())
-        if len(self._shape_vertices) >= 8:
-            self.push_transform()
-            self.reset_transform()
-            self.draw_curve(self._shape_transformed_vertices[-8], self._shape_transformed_vertices[-7],
-                            self._shape_transformed_vertices[-6], self._shape_transformed_vertices[-5],
-                            self._shape_transformed_vertices[-4], self._shape_transformed_vertices[-3],
-                            self._shape_transformed_vertices[-2], self._shape_transformed_vertices[-1])
-            self.pop_transform()
+        self._add_shape_vertex(x, y)
 
-    def vertex(self, x: float, y: float):
+    def vertex(self, x: float, y: float, color=None):
+        """
+        Define a vertex of the shape.
+
+        Each point, line, triangle or quad of the shape is drawn with the color of its last vertex.
+
+        :param x: x coordinate of the vertex
+        :param y: y coordinate of the vertex
+        :param color: color of the vertex. None means use the current fill color (or the current
+            foreground color for VertexType.POINTS and VertexType.LINES shapes). VertexType.POLY_LINE
+            shapes are drawn with the current colors, and can't use it.
+        :raises ValueError: if color is given for a VertexType.POLY_LINE shape
+        """
         if self._is_curve_shape:
             raise RuntimeError("no other vertex can be defined after cuver vertex!")
-        self._shape_vertices.append(x)
-        self._shape_vertices.append(y)
-        transform = self.get_transform()
-        point = transform.map(QtCore.QPointF(x, y))
-        self._shape_transformed_vertices.append(point.x())
-        self._shape_transformed_vertices.append(point.y())
+        if color is not None and self._shape_vertext_type == VertexType.POLY_LINE:
+            raise ValueError("Vertex colors can't be used in VertexType.POLY_LINE shapes!")
+        x, y = self._add_shape_vertex(x, y)
         if self._shape_vertext_type == VertexType.POLY_LINE:
             if self._shape_path.elementCount() > 0:
-                self._shape_path.lineTo(point.x(), point.y())
+                self._shape_path.lineTo(x, y)
             else:
-                self._shape_path.moveTo(point.x(), point.y())
-        elif self._shape_vertext_type == VertexType.POINTS:
-            self.draw_point(x, y)
-        elif self._shape_vertext_type == VertexType.LINES:
-            if len(self._shape_vertices) % 4 == 0:
-                self.push_transform()
-                self.reset_transform()
-                self.draw_line(self._shape_transformed_vertices[-4], self._shape_transformed_vertices[-3],
-                               self._shape_transformed_vertices[-2], self._shape_transformed_vertices[-1])
-                self.pop_transform()
-        elif self._shape_vertext_type == VertexType.TRIANGLES:
-            if len(self._shape_vertices) % 6 == 0:
-                self.push_transform()
-                self.reset_transform()
-                self.draw_polygon(self._shape_transformed_vertices[-6], self._shape_transformed_vertices[-5],
-                                  self._shape_transformed_vertices[-4], self._shape_transformed_vertices[-3],
-                                  self._shape_transformed_vertices[-2], self._shape_transformed_vertices[-1])
-                self.pop_transform()
-        elif self._shape_vertext_type == VertexType.TRIANGLE_STRIP:
-            if len(self._shape_vertices) >= 6:
-                self.push_transform()
-                self.reset_transform()
-                self.draw_polygon(self._shape_transformed_vertices[-6], self._shape_transformed_vertices[-5],
-                                  self._shape_transformed_vertices[-4], self._shape_transformed_vertices[-3],
-                                  self._shape_transformed_vertices[-2], self._shape_transformed_vertices[-1])
-                self.pop_transform()
-        elif self._shape_vertext_type == VertexType.TRIANGLE_FAN:
-            if len(self._shape_vertices) >= 6:
-                self.push_transform()
-                self.reset_transform()
-                self.draw_polygon(self._shape_transformed_vertices[0], self._shape_transformed_vertices[1],
-                                  self._shape_transformed_vertices[-4], self._shape_transformed_vertices[-3],
-                                  self._shape_transformed_vertices[-2], self._shape_transformed_vertices[-1])
-                self.pop_transform()
-        elif self._shape_vertext_type == VertexType.QUADS:
-            n = len(self._shape_vertices)
-            if n % 8 == 0:
-                self.push_transform()
-                self.reset_transform()
-                self.draw_polygon(self._shape_transformed_vertices[-8], self._shape_transformed_vertices[-7],
-                                  self._shape_transformed_vertices[-6], self._shape_transformed_vertices[-5],
-                                  self._shape_transformed_vertices[-4], self._shape_transformed_vertices[-3],
-                                  self._shape_transformed_vertices[-2], self._shape_transformed_vertices[-1])
-                self.pop_transform()
-        elif self._shape_vertext_type == VertexType.QUAD_STRIP:
-            n = len(self._shape_vertices)
-            if n >= 8 and n % 4 == 0:
-                self.push_transform()
-                self.reset_transform()
-                self.draw_polygon(self._shape_transformed_vertices[-8], self._shape_transformed_vertices[-7],
-                                  self._shape_transformed_vertices[-6], self._shape_transformed_vertices[-5],
-                                  self._shape_transformed_vertices[-2], self._shape_transformed_vertices[-1],
-                                  self._shape_transformed_vertices[-4], self._shape_transformed_vertices[-3])
-                self.pop_transform()
+                self._shape_path.moveTo(x, y)
+        elif color is not None:
+            self._shape_colors.append(_to_qcolor(color))
+        elif self._shape_vertext_type in (VertexType.POINTS, VertexType.LINES):
+            self._shape_colors.append(self._color)
+        else:
+            self._shape_colors.append(self._fill_color)
 
     def bezier_vertex(self, x1, y1, x2, y2, x3, y3):
         if self._is_curve_shape:
@@ -1587,11 +1825,11 @@ class Image:
             raise RuntimeError("Must call vertex() to set the start point before define bezier curve!")
         if self._shape_vertext_type != VertexType.POLY_LINE:
             raise RuntimeError("berzier_vertex() can only used with VertexType.POLY_LINE vertices!")
-        transform = self.get_transform()
-        p1 = transform.map(QtCore.QPointF(x1, y1))
-        p2 = transform.map(QtCore.QPointF(x2, y2))
-        p3 = transform.map(QtCore.QPointF(x3, y3))
-        self._shape_path.cubicTo(p1.x(), p1.y(), p2.x(), p2.y(), p3.x(), p3.y())
+        transform = self._get_transform()
+        x1, y1 = transform.map(float(x1), float(y1))
+        x2, y2 = transform.map(float(x2), float(y2))
+        x3, y3 = transform.map(float(x3), float(y3))
+        self._shape_path.cubicTo(x1, y1, x2, y2, x3, y3)
 
     def quadratic_vertex(self, x1, y1, x2, y2):
         if self._is_curve_shape:
@@ -1600,24 +1838,72 @@ class Image:
             raise RuntimeError("Must call vertex() to set the start point before define bezier curve!")
         if self._shape_vertext_type != VertexType.POLY_LINE:
             raise RuntimeError("quadratic_vertex() can only used with VertexType.POLY_LINE vertices!")
-        transform = self.get_transform()
-        p1 = transform.map(QtCore.QPointF(x1, y1))
-        p2 = transform.map(QtCore.QPointF(x2, y2))
-        self._shape_path.quadTo(p1.x(), p1.y(), p2.x(), p2.y())
+        transform = self._get_transform()
+        x1, y1 = transform.map(float(x1), float(y1))
+        x2, y2 = transform.map(float(x2), float(y2))
+        self._shape_path.quadTo(x1, y1, x2, y2)
 
     def end_shape(self, close=False):
+        """
+        End the shape definition, and draw it.
+
+        :param close: if the POLY_LINE shape should be closed
+        """
         if self._shape_vertext_type == VertexType.POLY_LINE:
             if close:
                 self.vertex(self._shape_vertices[0], self._shape_vertices[1])
-            self.push_transform()
-            self.reset_transform()
-            self.draw_path(self._shape_path)
-            self.pop_transform()
         elif close:
             raise RuntimeError("Only VertexType.POLY_LINE vertices can close!")
-        self._shape_path = None
-        self._shape_vertices.clear()
-        self._shape_transformed_vertices.clear()
+        self.push_transform()
+        self.reset_transform()
+        try:
+            if self._is_curve_shape:
+                if len(self._shape_transformed_vertices) >= 8:
+                    self.draw_curve(self._shape_transformed_vertices)
+            elif self._shape_vertext_type == VertexType.POLY_LINE:
+                self.draw_path(self._shape_path)
+            else:
+                self._draw_shape_primitives()
+        finally:
+            self.pop_transform()
+            self._shape_path = None
+            self._shape_vertices.clear()
+            self._shape_transformed_vertices.clear()
+            self._shape_colors.clear()
+
+    def _draw_shape_primitives(self):
+        """ draw the buffered points/lines/triangles/quads of the shape in one batch """
+        points = np.array(self._shape_transformed_vertices, dtype=np.float64).reshape(-1, 2)
+        indexes = _shape_primitive_indexes(self._shape_vertext_type, len(points))
+        if len(indexes) == 0:
+            return
+        # each primitive uses the color of its last vertex
+        colors = [self._shape_colors[i] for i in indexes.max(axis=1).tolist()]
+        if self._shape_vertext_type in (VertexType.POINTS, VertexType.LINES):
+            self._draw_outline_runs(points[indexes.ravel()], colors, indexes.shape[1])
+        elif all(color is self._fill_color for color in colors):
+            self.draw_polygons(points[indexes])
+        else:
+            self.draw_polygons(points[indexes], colors)
+
+    def _draw_outline_runs(self, points: np.ndarray, colors: list, k: int):
+        """ draw points (k=1) or lines (k=2), each run of the same color is drawn in one call """
+        p = self._prepare_painter_for_draw_outline()
+        pen = QtGui.QPen(self._pen)
+        draw = p.drawPoints if k == 1 else p.drawLines
+        draw_mask = self._mask_painter.drawPoints if k == 1 else self._mask_painter.drawLines
+        start = 0
+        for i in range(1, len(colors) + 1):
+            if i < len(colors) and colors[i] == colors[start]:
+                continue
+            pen.setColor(colors[start])
+            p.setPen(pen)
+            polygon = _array_to_qpolygon(points[start * k:i * k])
+            draw(polygon)
+            draw_mask(polygon)
+            start = i
+        p.setPen(self._pen)
+        self._updated()
 
     def set_font(self, font: QtGui.QFont):
         """
@@ -1627,6 +1913,7 @@ class Image:
         """
         self._painter.setFont(font)
         self._mask_painter.setFont(font)
+        self._font_info = None
 
     def get_font(self) -> QtGui.QFont:
         """
@@ -1646,6 +1933,7 @@ class Image:
         font.setPixelSize(size)
         self._painter.setFont(font)
         self._mask_painter.setFont(font)
+        self._font_info = None
 
     def get_font_size(self) -> int:
         """
@@ -1662,7 +1950,7 @@ class Image:
         :param text: the text
         :return: width of the text
         """
-        return self._painter.fontMetrics().width(text)
+        return self._get_font_metrics().width(text)
 
     def text_height(self) -> int:
         """
@@ -1670,7 +1958,7 @@ class Image:
 
         :return: height of the text (font height)
         """
-        return self._painter.fontMetrics().height()
+        return self._get_font_metrics().height()
 
     def close(self):
         """
@@ -1678,47 +1966,63 @@ class Image:
 
         :param image: the image to be closed
         """
-        self._painter.end()
-        self._mask_painter.end()
+        if self._painter.isActive():
+            self._painter.end()
+        if self._mask_painter.isActive():
+            self._mask_painter.end()
         self._updated_listeners.clear()
+        self._static_texts.clear()
+        self._foregrounds.clear()
+        for buffer, array in self._mapped_buffers:
+            buffer.flush()
 
     def get_painter(self) -> QtGui.QPainter:
         """
         Get the QPainter instance for drawing the image.
 
+        The image doesn't know what is done with the painter directly, so its cached states (like the
+        transform, the font metrics and the foreground used by draw_image(), to_bytes() and save() without
+        background) are refreshed when this method is called. Call it again before each custom drawing,
+        instead of keeping the painter.
+
         :return: the painter used internally
         """
+        self._transform_changed()
+        self._font_info = None
+        # the contents may be changed by the caller
+        self._version += 1
         return self._painter
 
     def get_mask_painter(self) -> QtGui.QPainter:
         """
         Get the QPainter instance for drawing the mask.
 
+        Like get_painter(), call it again before each custom drawing.
+
         :return: the mask painter used internally
         """
+        # the contents may be changed by the caller
+        self._version += 1
         return self._mask_painter
 
     def save_settings(self):
         """
         Save current drawing settings.
 
-        See restore_settings().
+        Settings are saved to a stack, so save_settings()/restore_settings() can be nested.
+        See restore_settings() and settings().
 
         Note: current position won't  be saved and restored.
 
         """
+        record = _SettingsRecord(self)
         self._painter.save()
-        self._mask_painter.save()
-        self._old_flip_y = self._flip_y
-        self._old_rect_mode = self._rect_mode
-        self._old_ellipse_mode = self._ellipse_mode
-        self._old_color = self._color
-        self._old_line_style = self._line_style
-        self._old_line_width = self._line_width
-        self._old_fill_color = self._fill_color
-        self._old_fill_style = self._fill_style
-        self._old_fill_rule = self._fill_rule
-        self._old_background_color = self._background_color
+        # the transform, clip and view port are set on both painters, so the mask painter is always
+        # saved too. It's only inactive after the image is closed.
+        if self._mask_painter.isActive():
+            self._mask_painter.save()
+            record.mask_saved = True
+        self._settings_stack.append(record)
 
     def restore_settings(self):
         """
@@ -1727,49 +2031,99 @@ class Image:
         See save_settings().
 
         Note: current position won't  be saved and restored.
+
+        :raises RuntimeError: if there are no saved settings
         """
+        if len(self._settings_stack) <= 0:
+            raise RuntimeError("No more settings to restore!")
+        record = self._settings_stack.pop()
         self._painter.restore()
-        self._mask_painter.restore()
-        self._flip_y = self._old_flip_y
-        self._rect_mode = self._old_rect_mode
-        self._ellipse_mode = self._old_ellipse_mode
-        self._color = self._old_color
-        self._line_style = self._old_line_style
-        self._line_width = self._old_line_width
-        self._fill_color = self._old_fill_color
-        self._fill_style = self._old_fill_style
-        self._fill_rule = self._old_fill_rule
-        self._background_color = self._old_background_color
-
-    def save(self, filename: str, with_background=True):
+        # only restore the mask painter if it was saved, to keep the two painters' stacks in sync
+        if record.mask_saved and self._mask_painter.isActive():
+            self._mask_painter.restore()
+        record.restore(self)
+        self._font_info = None
+        self._transform_changed()
+
+    def _copy_settings_from(self, image: "Image"):
+        """ use the drawing settings of the other image, like the BGI's settings shared by all the pages """
+        record = _SettingsRecord(image)
+        record.flip_y = self._flip_y
+        record.restore(self)
+        self.set_flip_y(image._flip_y)
+        self.set_font(image.get_font())
+        self.set_composition_mode(image.get_composition_mode())
+        self.set_render_quality(image.get_render_quality())
+
+    def settings(self) -> "_SettingsContext":
+        """
+        Get a context manager which saves the drawing settings on enter, and restores them on exit.
+
+        >>> with image.settings():
+        >>>     image.set_color(Color.RED)
+        >>>     image.draw_line(0, 0, 100, 100)
+
+        :return: the context manager
+        """
+        return _SettingsContext(self)
+
+    def save(self, filename: str, with_background=True, format: str = None, quality: int = -1):
         """
         Save image to file.
 
         Set with_background to False to get a transparent background image.
 
         Note that JPEG format doesn\'t support transparent. Use PNG format if you want a transparent background.
-        
+
+        The format can be any format supported by Qt (i.e. "PNG", "JPG", "BMP", "PPM"), or "RGBA" for the
+        uncompressed raw RGBA bytes. None means it's guessed from the file's suffix.
+
+        Quality is in the range 0 to 100, -1 means the default setting. For PNG, it's the compression level:
+        0 gives the smallest file and 100 gives the fastest encoding (no compression).
+
         :param filename: path of the file
         :param with_background: True to save the background together. False not
+        :param format: format of the file
+        :param quality: quality (or compression level) of the image
         """
         img = _prepare_image_for_copy(self, with_background)
-        img.save(filename)
+        _save_image(img, filename, format, quality)
 
-    def to_bytes(self, with_background=True, format: str = "PNG") -> bytes:
+    def to_bytes(self, with_background=True, format: str = "PNG", quality: int = -1) -> bytes:
         """
         Convert the image to the specified format (i.e. PNG format) bytes.
 
+        The format can be any format supported by Qt (i.e. "PNG", "JPG", "BMP", "PPM"), or "RGBA" for the
+        uncompressed raw RGBA bytes (4 bytes for each pixel, row by row).
+
+        Quality is in the range 0 to 100, -1 means the default setting. For PNG, it's the compression level:
+        0 gives the smallest size and 100 gives the fastest encoding (no compression).
+
         :param with_background:  True to save the background together. False not
         :param format: format of the bytes content
+        :param quality: quality (or compression level) of the image
         :return: bytes in the specified format
         """
-        ba = QtCore.QByteArray()
-        buffer = QtCore.QBuffer(ba)
-        buffer.open(QtCore.QIODevice.ReadWrite)
         img = _prepare_image_for_copy(self, with_background)
-        img.save(buffer, "PNG")
-        buffer.close()
-        return ba.data()
+        return _encode_image(img, format, quality)
+
+    def to_memoryview(self, with_background=True) -> memoryview:
+        """
+        Get a memoryview of the image's pixels, without copying.
+
+        The view is (height, width, 4) unsigned bytes, in the QImage premultiplied ARGB32 layout
+        (B, G, R, A on little endian machines).
+
+        With background, it's a view of the image itself, so it changes when the image is drawn. Don't
+        keep it after the image is closed.
+
+        :param with_background:  True to get the background together. False not
+        :return: the pixels
+        """
+        img = _prepare_image_for_copy(self, with_background)
+        if img.format() != QtGui.QImage.Format_ARGB32_Premultiplied:
+            img = img.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+        return memoryview(qn.byte_view(img))
 
     def set_rect_mode(self, mode):
         self._rect_mode = mode
@@ -1784,6 +2138,8 @@ class Image:
         return self._ellipse_mode
 
     def _updated(self):
+        # caches of the image contents (see _get_foreground()) are stamped with the version
+        self._version += 1
         for listener in self._updated_listeners:
             listener()
 
@@ -1812,19 +2168,65 @@ class Image:
         self.close()
 
     @staticmethod
-    def create(width: int, height: int) -> "Image":
+    def create(width: int, height: int, format: int = QtGui.QImage.Format_ARGB32_Premultiplied) -> "Image":
         """
         Create a new image.
 
+        The format can be QImage.Format_ARGB32_Premultiplied (the default), QImage.Format_ARGB32,
+        QImage.Format_RGB32 or QImage.Format_Grayscale8 (uses 1/4 of the memory, for gray drawings).
+        Colors are converted to the image's format automatically when drawing.
+
+        Qt can't draw on indexed (QImage.Format_Indexed8) or mono (QImage.Format_Mono) images. To get them,
+        convert the result: image.get_image().convertToFormat(format, color_table).
+
         :param width: width of the new image
         :param height: height of the new image
+        :param format: format of the new image
         :return: the created image
         """
-        qimage = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+        if format not in _IMAGE_FORMATS:
+            raise ValueError("Can't draw on images of format {}! Use one of the ARGB32, RGB32 or Grayscale8 "
+                             "formats, and convert the image when drawing finished.".format(format))
+        qimage = QtGui.QImage(width, height, format)
         qimage.fill(Color.WHITE)
         image = Image(qimage)
         return image
 
+    @staticmethod
+    def create_mapped(width: int, height: int, filename: str, map_mask: bool = False) -> "Image":
+        """
+        Create a new image, whose pixels are saved in a memory-mapped file.
+
+        The OS pages the pixels in and out of memory as needed, so it can be used for very large images.
+        The file is created (or overwritten) and contains the raw pixels in the QImage premultiplied
+        ARGB32 layout: row by row, 4 bytes for each pixel (B, G, R, A on little endian machines).
+        Other processes can read the finished image from the file without copying.
+
+        The background mask is kept in memory, unless map_mask is True.
+
+        :param width: width of the new image
+        :param height: height of the new image
+        :param filename: path of the file to map
+        :param map_mask: True to also map the background mask (one byte per pixel) to the file filename + ".mask"
+        :return: the created image
+        """
+        buffer, array = _map_file(filename, width * height * 4)
+        buffers = [(buffer, array)]
+        qimage = QtGui.QImage(sip.voidptr(array.ctypes.data), width, height, width * 4,
+                              QtGui.QImage.Format_ARGB32_Premultiplied)
+        qimage.fill(Color.WHITE)
+        mask = None
+        if map_mask:
+            # each line of the one byte per pixel mask is aligned to 4 bytes
+            mask_line_size = (width + 3) // 4 * 4
+            mask_buffer, mask_array = _map_file(filename + ".mask", mask_line_size * height)
+            buffers.append((mask_buffer, mask_array))
+            mask = QtGui.QImage(sip.voidptr(mask_array.ctypes.data), width, height, mask_line_size, _MASK_FORMAT)
+        image = Image(qimage, mask)
+        # the QImages don't own the buffers, so keep them (and their exports) alive as long as the image
+        image._mapped_buffers = buffers
+        return image
+
     @staticmethod
     def create_from_file(filename: str) -> "Image":
         """
@@ -1837,6 +2239,95 @@ class Image:
         return Image(image)
 
 
+class _SettingsRecord:
+    """
+    One level of saved drawing settings (see Image.save_settings()).
+    """
+    __slots__ = ('flip_y', 'rect_mode', 'ellipse_mode', 'color', 'line_style', 'line_width', 'fill_color',
+                 'fill_style', 'fill_rule', 'background_color', 'pen', 'brush', 'mask_saved')
+
+    def __init__(self, image: Image):
+        self.flip_y = image._flip_y
+        self.rect_mode = image._rect_mode
+        self.ellipse_mode = image._ellipse_mode
+        self.color = image._color
+        self.line_style = image._line_style
+        self.line_width = image._line_width
+        self.fill_color = image._fill_color
+        self.fill_style = image._fill_style
+        self.fill_rule = image._fill_rule
+        self.background_color = image._background_color
+        # pen and brush are changed in place by the setters, so keep copies of them
+        self.pen = QtGui.QPen(image._pen)
+        self.brush = QtGui.QBrush(image._brush)
+        # if the mask painter's state is saved together (see Image.save_settings()). It's False only
+        # if the image was closed when saving.
+        self.mask_saved = False
+
+    def restore(self, image: Image):
+        image._flip_y = self.flip_y
+        image._rect_mode = self.rect_mode
+        image._ellipse_mode = self.ellipse_mode
+        image._color = self.color
+        image._line_style = self.line_style
+        image._line_width = self.line_width
+        image._fill_color = self.fill_color
+        image._fill_style = self.fill_style
+        image._fill_rule = self.fill_rule
+        image._background_color = self.background_color
+        image._pen = self.pen
+        image._brush = self.brush
+
+
+class _SettingsContext:
+    """
+    Context manager returned by Image.settings().
+    """
+    __slots__ = ('_image',)
+
+    def __init__(self, image: Image):
+        self._image = image
+
+    def __enter__(self) -> Image:
+        self._image.save_settings()
+        return self._image
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._image.restore_settings()
+        return False
+
+
+def _fill_image(image: QtGui.QImage, color):
+    """ fill the image with the color. 8 bit images are filled with the raw value, which doesn't use a painter """
+    if image.depth() == 32:
+        image.fill(color)
+    else:
+        image.fill(int(_pixel_values(image.format(), color)[1]))
+
+
+def _pixel_channels(view: np.ndarray) -> np.ndarray:
+    """ get the (H,W,C) channel values of a raw view """
+    if view.dtype == np.uint8:
+        return view[:, :, None]
+    return view.view(np.uint8).reshape(view.shape + (view.itemsize,))
+
+
+def _pixel_values(image_format: int, color) -> (int, int):
+    """ get the color's value returned by QImage.pixel(), and its raw value in the image, of the image format """
+    img = QtGui.QImage(1, 1, image_format)
+    img.setPixelColor(0, 0, _to_qcolor(color))
+    return img.pixel(0, 0), qn.raw_view(img)[0, 0]
+
+
+def _map_file(filename: str, size: int) -> (mmap.mmap, np.ndarray):
+    """ create the file with the size, and map it to the memory. return the map and an array view of it """
+    with open(filename, "w+b") as f:
+        f.truncate(size)
+        buffer = mmap.mmap(f.fileno(), size)
+    # while the array is alive, it holds the buffer export, so the map can't be closed under the QImage
+    return buffer, np.frombuffer(buffer, dtype=np.uint8)
+
+
 def _calc_rect(x1: float, y1: float, x2: float, y2: float, mode) -> QtCore.QRectF:
     if mode == ShapeMode.RADIUS:
         p1 = QtCore.QPointF(x1 - x2, y1 - y2)
@@ -1863,25 +2354,196 @@ def _to_qcolor(val: Union[int, str, QtGui.QColor]) -> Union[QtGui.QColor, int]:
     return color
 
 
+def _array_to_qpolygon(points: np.ndarray) -> QtGui.QPolygonF:
+    """ convert a (K,2) float64 array to QPolygonF, by copying into the polygon's buffer directly """
+    polygon = QtGui.QPolygonF(len(points))
+    buffer = polygon.data()
+    buffer.setsize(points.size * 8)
+    np.frombuffer(buffer, dtype=np.float64).reshape(points.shape)[:] = points
+    return polygon
+
+
+def _shape_primitive_indexes(vertex_type: int, n: int) -> np.ndarray:
+    """ get the (M,K) vertex indexes of the M primitives made of n vertices """
+    if vertex_type == VertexType.POINTS:
+        return np.arange(n).reshape(-1, 1)
+    if vertex_type == VertexType.LINES:
+        return np.arange(n // 2 * 2).reshape(-1, 2)
+    if vertex_type == VertexType.TRIANGLES:
+        return np.arange(n // 3 * 3).reshape(-1, 3)
+    if vertex_type == VertexType.QUADS:
+        return np.arange(n // 4 * 4).reshape(-1, 4)
+    if vertex_type == VertexType.TRIANGLE_STRIP:
+        i = np.arange(max(n - 2, 0))
+        return np.column_stack((i, i + 1, i + 2))
+    if vertex_type == VertexType.TRIANGLE_FAN:
+        i = np.arange(1, max(n - 1, 1))
+        return np.column_stack((np.zeros_like(i), i, i + 1))
+    if vertex_type == VertexType.QUAD_STRIP:
+        i = np.arange(0, max(n - 3, 0), 2)
+        return np.column_stack((i, i + 1, i + 3, i + 2))
+    raise ValueError("Unknown vertex type: {}".format(vertex_type))
+
+
+def _curve_points(points: tuple) -> np.ndarray:
+    """ convert the control points (numbers, pairs or an array) to a (N,2) float64 array """
+    if len(points) == 1:
+        points = points[0]
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def _spline_to_beziers(points: np.ndarray, spline_type: int) -> tuple:
+    """
+    convert the spline to the cubic bezier segments.
+
+    :return: (starts, first controls, second controls, ends) of the segments, each is a (M,2) array
+    """
+    p0 = points[:-3]
+    p1 = points[1:-2]
+    p2 = points[2:-1]
+    p3 = points[3:]
+    if spline_type == SplineType.CATMULL_ROM:
+        return p1, p1 + (p2 - p0) / 6, p2 - (p3 - p1) / 6, p2
+    if spline_type == SplineType.CENTRIPETAL_CATMULL_ROM:
+        # sqrt of the distances (alpha = 0.5), coincident points must not divide by zero
+        d = np.sqrt(np.maximum(np.hypot(*(points[1:] - points[:-1]).T), 1e-12))[:, None]
+        d1 = d[:-2]
+        d2 = d[1:-1]
+        d3 = d[2:]
+        c1 = (d1 * d1 * p2 - d2 * d2 * p0 + (2 * d1 * d1 + 3 * d1 * d2 + d2 * d2) * p1) / (3 * d1 * (d1 + d2))
+        c2 = (d3 * d3 * p1 - d2 * d2 * p3 + (2 * d3 * d3 + 3 * d3 * d2 + d2 * d2) * p2) / (3 * d3 * (d3 + d2))
+        return p1, c1, c2, p2
+    if spline_type == SplineType.B_SPLINE:
+        return (p0 + 4 * p1 + p2) / 6, (2 * p1 + p2) / 3, (p1 + 2 * p2) / 3, (p1 + 4 * p2 + p3) / 6
+    raise ValueError("Unknown spline type: {}".format(spline_type))
+
+
+def _flatten_beziers(starts: np.ndarray, controls1: np.ndarray, controls2: np.ndarray, ends: np.ndarray,
+                     tolerance: float) -> np.ndarray:
+    """ flatten the cubic bezier segments to a (K,2) polyline, whose distance to the curves is less than tolerance """
+    # the flattening error of n uniform steps is at most 3/4 * max|second difference| / n^2
+    dd = np.maximum(np.hypot(*(starts - 2 * controls1 + controls2).T),
+                    np.hypot(*(controls1 - 2 * controls2 + ends).T))
+    steps = np.clip(np.ceil(np.sqrt(0.75 * dd / tolerance)), 1, 1000).astype(np.intp)
+    segments = np.repeat(np.arange(len(steps)), steps)
+    offsets = np.repeat(np.cumsum(steps) - steps, steps)
+    t = ((np.arange(len(segments)) - offsets + 1) / steps[segments])[:, None]
+    s = 1 - t
+    curve = s * s * s * starts[segments] + 3 * s * s * t * controls1[segments] \
+        + 3 * s * t * t * controls2[segments] + t * t * t * ends[segments]
+    return np.concatenate((starts[:1], curve))
+
+
+def _is_simple_text(text: str) -> bool:
+    """ test if the text is a single line text that can be drawn as a static text """
+    return '\n' not in text and '\t' not in text
+
+
+def _calc_src_rect(image: Image, src_x: int, src_y: int, src_width: int, src_height: int) -> QtCore.QRect:
+    """ get the part of the image to be drawn. width and height <= 0 means all the way to the bottom-right """
+    if src_width <= 0:
+        src_width = image.get_width() - src_x
+    if src_height <= 0:
+        src_height = image.get_height() - src_y
+    return QtCore.QRect(src_x, src_y, src_width, src_height).intersected(image.get_image().rect())
+
+
 def _prepare_image_for_copy(image: Image, with_background: bool) -> QtGui.QImage:
     img = image.get_image()
     if not with_background:
-        img = _get_foreground(image)
+        img, mask = _get_foreground(image)
     return img
 
 
-def _get_foreground(image):
-    img = QtGui.QImage(image.get_width(), image.get_height(), QtGui.QImage.Format_ARGB32_Premultiplied)
-    img.fill(Color.TRANSPARENT)
-    painter = QtGui.QPainter()
-    painter.begin(img)
-    mask = QtGui.QBitmap.fromImage(image.get_mask().createMaskFromColor(MASK_WHITE.rgba()))
-    region = QtGui.QRegion(mask)
-    painter.setClipRegion(region)
-    painter.drawImage(0, 0, image.get_image())
-    painter.end()
-    return img
+def _save_image(img: QtGui.QImage, filename: str, format: str, quality: int):
+    if format is not None and format.upper() in _RAW_FORMATS:
+        with open(filename, "wb") as f:
+            f.write(_encode_image(img, format, quality))
+    elif not img.save(filename, format, quality):
+        raise RuntimeError("Can't save the image to {}!".format(filename))
+
+
+def _encode_image(img: QtGui.QImage, format: str, quality: int) -> bytes:
+    raw_format = _RAW_FORMATS.get(format.upper(), None)
+    if raw_format is not None:
+        img = img.convertToFormat(raw_format)
+        bits = img.constBits()
+        bits.setsize(img.sizeInBytes())
+        return bytes(bits)
+    ba = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(ba)
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    if not img.save(buffer, format, quality):
+        raise ValueError("Can't convert the image to {} format!".format(format))
+    buffer.close()
+    return ba.data()
+
 
+def _get_foreground(image: Image, rect: QtCore.QRect = None) -> (QtGui.QImage, QtGui.QImage):
+    """
+    Get the foreground (the drawn pixels) in the rect (None means the whole image) of the image,
+    and the mask of the foreground (MASK_BLACK on the drawn pixels, transparent on the others).
+
+    The result is cached in the image, until the image is updated.
+    """
+    if rect is None:
+        rect = image.get_image().rect()
+    key = (rect.x(), rect.y(), rect.width(), rect.height())
+    cached = image._foregrounds.get(key, None)
+    if cached is not None and cached[0] == image._version:
+        return cached[1], cached[2]
+    x, y, w, h = key
+    drawn = image._mask_view[y:y + h, x:x + w] != _MASK_WHITE_RAW
+    src_format = image.get_image().format()
+    if src_format in _FOREGROUND_FORMATS:
+        src = image._image_view[y:y + h, x:x + w]
+        img = QtGui.QImage(w, h, _FOREGROUND_FORMATS[src_format])
+    else:
+        img = image.get_image().copy(rect).convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+        src = qn.raw_view(img).copy()
+    img.fill(Color.TRANSPARENT)
+    np.copyto(qn.raw_view(img), src, where=drawn)
+    mask = QtGui.QImage(w, h, QtGui.QImage.Format_ARGB32_Premultiplied)
+    mask.fill(Color.TRANSPARENT)
+    np.copyto(qn.raw_view(mask), np.uint32(MASK_BLACK.rgba()), where=drawn)
+    if len(image._foregrounds) >= _FOREGROUND_CACHE_SIZE:
+        image._foregrounds.clear()
+    image._foregrounds[key] = image._version, img, mask
+    return img, mask
+
+
+# raw formats supported by to_bytes() and save() -> the QImage formats with the same layout
+_RAW_FORMATS = {
+    "RGBA": QtGui.QImage.Format_RGBA8888,
+}
+_FOREGROUND_CACHE_SIZE = 256
+# source image format -> foreground image format. the raw pixels can be copied directly between them
+_FOREGROUND_FORMATS = {
+    QtGui.QImage.Format_RGB32: QtGui.QImage.Format_ARGB32_Premultiplied,
+    QtGui.QImage.Format_ARGB32: QtGui.QImage.Format_ARGB32,
+    QtGui.QImage.Format_ARGB32_Premultiplied: QtGui.QImage.Format_ARGB32_Premultiplied,
+}
+
+
+_STATIC_TEXT_CACHE_SIZE = 256
+_STATIC_TEXT_FLAGS = int(QtCore.Qt.AlignHorizontal_Mask) | int(QtCore.Qt.AlignVertical_Mask) | \
+                     int(QtCore.Qt.TextDontClip) | int(QtCore.Qt.TextSingleLine) | int(QtCore.Qt.TextWordWrap)
 
 MASK_WHITE = _to_qcolor(Color.WHITE)
 MASK_BLACK = _to_qcolor(Color.BLACK)
+# the mask only holds black and white, so one byte per pixel is enough
+_MASK_FORMAT = QtGui.QImage.Format_Grayscale8
+_MASK_WHITE_RAW = 255
+_MASK_BLACK_RAW = 0
+_IMAGE_FORMATS = (QtGui.QImage.Format_ARGB32_Premultiplied, QtGui.QImage.Format_ARGB32,
+                  QtGui.QImage.Format_RGB32, QtGui.QImage.Format_Grayscale8)
+
+_ALL_RENDER_HINTS = QtGui.QPainter.Antialiasing | QtGui.QPainter.TextAntialiasing | \
+                    QtGui.QPainter.SmoothPixmapTransform
+_RENDER_HINTS = {
+    RenderQuality.LOW: QtGui.QPainter.RenderHints(),
+    RenderQuality.NORMAL: QtGui.QPainter.RenderHints(QtGui.QPainter.TextAntialiasing),
+    RenderQuality.HIGH: _ALL_RENDER_HINTS,
+}
+# a one pixel wide anti-aliased line always has a 4-connected chain of pixels covered at least this much
+_BLENDED_BORDER_COVERAGE = 0.1
@@ -8,12 +8,12 @@ __all__ = [
     'COPY_PUT', 'XOR_PUT', 'AND_PUT', 'OR_PUT', 'NOT_PUT',
     'LEFT_TEXT', 'CENTER_TEXT', 'RIGHT_TEXT', 'TOP_TEXT', 'BOTTOM_TEXT',
     'arc', 'bar', 'circle', 'cleardevice', 'clearviewport', 'closegraph',
-    'drawpoly', 'ellipse', 'fillellipse', 'fillpoly', 'floodfill',
-    'getbkcolor', 'getcolor', 'getfillsettings', 'getimage', 'getlinesettings',
+    'drawpoly', 'ellipse', 'fillellipse', 'fillpoly', 'floodfill', 'getactivepage',
+    'getbkcolor', 'getcolor', 'getfillsettings', 'getimage', 'getlinesettings', 'getvisualpage',
     'getmaxx', 'getmaxy', 'getpixel', 'getx', 'gety', 'initgraph', 'line',
     'linerel', 'lineto', 'moverel', 'moveto', 'outtext', 'outtextxy',
     'pieslice', 'putimage', 'putpixel', 'rectangle', 'sector', 'setbkcolor',
-    'setcolor', 'setfillstyle', 'setlinestyle', 'settextjustify', 'setviewport',
+    'setactivepage', 'setcolor', 'setfillstyle', 'setlinestyle', 'settextjustify', 'setviewport', 'setvisualpage',
     'setwritemode', 'textheight', 'textwidth'
 ]
 
@@ -95,6 +95,8 @@ fillpoly = eg.fill_polygon
 
 floodfill = eg.flood_fill
 
+getactivepage = eg.get_active_page
+
 getbkcolor = eg.get_background_color
 
 getcolor = eg.get_color
@@ -109,7 +111,18 @@ def getfillsettings(img: Image = None):
     return eg.get_fill_style(img), eg.get_fill_color(img)
 
 
-getimage = eg.capture_screen
+def getimage(left: int, top: int, right: int, bottom: int, target_img: Image):
+    """
+    Save the specified region of the active page (the target image) to the target image.
+
+    :param left: x coordinate of the region's upper left corner
+    :param top: y coordinate of the region's upper left corner
+    :param right: x coordinate of the region's bottom right corner
+    :param bottom: y coordinate of the region's bottom right corner
+    :param target_img: image to save the region
+    """
+    eg.draw_image(0, 0, eg.get_target(), src_x=left, src_y=top, src_width=right - left,
+                  src_height=bottom - top, dst_image=target_img)
 
 
 def getlinesettings(img: Image = None):
@@ -141,6 +154,8 @@ def getmaxy(img: Image = None):
 
 getpixel = eg.get_pixel
 
+getvisualpage = eg.get_visual_page
+
 getx = eg.get_drawing_x
 
 gety = eg.get_drawing_y
@@ -219,6 +234,8 @@ rectangle = eg.rect
 
 sector = eg.draw_pie
 
+setactivepage = eg.set_active_page
+
 setbkcolor = eg.set_background_color
 
 setcolor = eg.set_color
@@ -265,6 +282,8 @@ def settextjustify(horiz: int, vert: int):
 
 setviewport = eg.set_view_port
 
+setvisualpage = eg.set_visual_page
+
 
 def setwritemode(mode, img: Image = None):
     """
@@ -19,9 +19,13 @@ __all__ = [
     # control functions
     'redraw', 'loop', 'noloop', 'run_app',
     'set_size', 'full_screen', 'draw', 'setup', 'set_frame_rate', 'get_frame_rate',
+    'enable_frame_stats', 'get_frame_stats',
+    # layer functions
+    'create_graphics', 'move_graphics', 'remove_graphics',
     # keyboard and mouse functions #
     'mouse_x', 'mouse_y', 'mouse_pressed', 'on_mouse_wheel', 'on_mouse_dragged',
     'on_mouse_released', 'on_mouse_pressed', 'on_mouse_clicked', 'prev_mouse_y', 'prev_mouse_x',
+    'get_mouse_samples',
     'ProcessingWidget'
 ]
 
@@ -87,13 +91,26 @@ def redraw():
 
     You must NOT redefine this function!
     """
-    global mouse_x, mouse_y, prev_mouse_x, prev_mouse_y
-    pos = _widget.mapFromGlobal(QtGui.QCursor.pos())
-    mouse_x = pos.x()
-    mouse_y = pos.y()
     _widget.redraw()
-    prev_mouse_x = mouse_x
-    prev_mouse_y = mouse_y
+
+
+def get_mouse_samples() -> list:
+    """
+    Get all the mouse positions received since the last frame, in order.
+
+    Fast mouse moves between two frames are not collapsed to one position, so they can be used
+    to draw strokes accurately. The last sample is (mouse_x, mouse_y). At most the latest
+    1000 samples are kept.
+
+    >>> def draw():
+    >>>     x, y = prev_mouse_x, prev_mouse_y
+    >>>     for nx, ny in get_mouse_samples():
+    >>>         line(x, y, nx, ny)
+    >>>         x, y = nx, ny
+
+    :return: list of (x, y) positions. It's empty if the mouse is not moved.
+    """
+    return _widget.get_mouse_samples()
 
 
 def get_canvas() -> Image:
@@ -123,11 +140,85 @@ def set_frame_rate(fps: int):
     _widget.set_frame_rate(fps)
 
 
-def run_app(_globals):
+def enable_frame_stats(enabled: bool = True, overlay: bool = False):
+    """
+    Turn on/off the per-frame instrumentation.
+
+    :param enabled: True to turn on, False to turn off
+    :param overlay: True to show the stats on the top-left corner of the canvas
+    """
+    _widget.enable_frame_stats(enabled, overlay)
+
+
+def get_frame_stats() -> dict:
+    """
+    Get the per-frame instrumentation data.
+
+    See easygraphics.get_frame_stats().
+
+    :return: the stats dict
+    """
+    return _widget.get_frame_stats()
+
+
+def create_graphics(width: int, height: int, x: int = 0, y: int = 0, below: bool = False) -> Image:
+    """
+    Create an offscreen layer (like createGraphics() in Processing).
+
+    The layer is transparent when created, and is composited with the canvas in every frame.
+    Layers are only re-composited when they are changed, so static contents (like backgrounds)
+    can be drawn on a layer once, instead of in every draw().
+
+    Layers below the canvas are only visible through the transparent parts of the canvas.
+
+    :param width: width of the layer
+    :param height: height of the layer
+    :param x: x coordinate of the layer's left-top corner on the canvas
+    :param y: y coordinate of the layer's left-top corner on the canvas
+    :param below: True to put the layer below the canvas, False to put it above the canvas
+    :return: the layer image
+    """
+    return _widget.create_graphics(width, height, x, y, below)
+
+
+def move_graphics(image: Image, x: int, y: int):
+    """
+    Move the layer created by create_graphics().
+
+    :param image: the layer image
+    :param x: x coordinate of the layer's new left-top corner on the canvas
+    :param y: y coordinate of the layer's new left-top corner on the canvas
+    """
+    _widget.move_graphics(image, x, y)
+
+
+def remove_graphics(image: Image):
+    """
+    Remove (and close) the layer created by create_graphics().
+
+    :param image: the layer image
+    """
+    _widget.remove_graphics(image)
+
+
+def run_app(_globals, frames: int = 0, output: str = ".", format: str = "PNG", quality: int = -1,
+            verbose: bool = False):
     """
     Run the processing app.
 
+    If frames > 0, the app runs in the offline mode: the window is not shown, draw() is called
+    back-to-back for the specified frames (without the frame rate pacing), and the frames are saved
+    to the output dir as "frame00000.png", "frame00001.png", ... The achieved fps is returned.
+
+    >>> run_app(globals(), frames=3000, output="out")
+
     :param _globals: the python globals dict.
+    :param frames: number of frames to render in the offline mode. 0 means run the app normally.
+    :param output: the dir to save the frames in the offline mode
+    :param format: format of the frame files (see Image.save())
+    :param quality: quality (or compression level) of the frame files (see Image.save())
+    :param verbose: True to print the achieved fps in the offline mode
+    :return: dict of the rendered frames, the seconds used and the achieved fps in the offline mode, or None
     """
     global _app, _widget, setup, draw, on_mouse_clicked
     global on_mouse_pressed, on_mouse_released, on_mouse_dragged, on_mouse_wheel
@@ -148,10 +239,18 @@ def run_app(_globals):
     _app = QtWidgets.QApplication([])
     _widget = _ProcessingWidget()
     _widget.start()
-    _widget.show()
-    _app.exec()
+    report = None
+    if frames > 0:
+        report = _widget.render_offline(frames, output, format, quality)
+        if verbose:
+            print("Rendered {} frames in {:.2f} seconds ({:.1f} fps)".format(report['frames'], report['seconds'],
+                                                                          report['fps']))
+    else:
+        _widget.show()
+        _app.exec()
     _widget = None
     _app = None
+    return report
 
 
 # mouse functions #
@@ -208,24 +307,37 @@ class _ProcessingWidget(ProcessingWidget):
     def setup(self):
         setup()
 
+    def _sync_mouse(self):
+        global mouse_x, mouse_y, prev_mouse_x, prev_mouse_y
+        mouse_x = self.mouse_x
+        mouse_y = self.mouse_y
+        prev_mouse_x = self.prev_mouse_x
+        prev_mouse_y = self.prev_mouse_y
+
     def draw(self):
+        self._sync_mouse()
         draw()
 
     def on_mouse_clicked(self):
+        self._sync_mouse()
         on_mouse_clicked()
 
     def on_mouse_pressed(self):
         global mouse_pressed
         mouse_pressed = True
+        self._sync_mouse()
         on_mouse_pressed()
 
     def on_mouse_released(self):
         global mouse_pressed
+        self._sync_mouse()
         on_mouse_released()
         mouse_pressed = False
 
     def on_mouse_dragged(self):
+        self._sync_mouse()
         on_mouse_dragged()
 
     def on_mouse_wheel(self, e: QtGui.QWheelEvent):
+        self._sync_mouse()
         on_mouse_wheel(e)
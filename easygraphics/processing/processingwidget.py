@@ -1,11 +1,48 @@
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from PyQt5 import QtCore, QtWidgets, QtGui
-from easygraphics import Image
+from easygraphics import Image, Color
+from easygraphics._utils.frame_stats import FrameStats
+from easygraphics.image import _save_image
 import time
 
 __all__ = ['ProcessingWidget']
 
+# the max count of the buffered mouse samples, in case no frames are drawn (i.e. after noloop())
+_MAX_MOUSE_SAMPLES = 1000
+
+
+class _Layer:
+    """
+    An offscreen layer created by ProcessingWidget.create_graphics().
+    """
+    __slots__ = ('image', 'x', 'y', 'below', 'composited_version')
+
+    def __init__(self, image: Image, x: int, y: int, below: bool):
+        self.image = image
+        self.x = x
+        self.y = y
+        self.below = below
+        # version of the image when it's composited. The layer is dirty if the image's version is different.
+        self.composited_version = -1
+
+    def is_dirty(self) -> bool:
+        return self.image._version != self.composited_version
+
+
+class _LayerCache:
+    """
+    The composited image of a group of layers.
+    """
+    __slots__ = ('dirty', 'image')
+
+    def __init__(self):
+        # set when a layer of the group is added, moved or removed
+        self.dirty = True
+        self.image = None
+
 
 class ProcessingWidget(QtWidgets.QWidget):
     """
@@ -20,6 +57,11 @@ class ProcessingWidget(QtWidgets.QWidget):
         super().__init__(*args, **kwargs)
         self._capture_dir = "."
         self._capture_count = 0
+        self._frame_stats = None
+        self._show_frame_stats = False
+        self._layers = []
+        self._below_cache = _LayerCache()
+        self._above_cache = _LayerCache()
         if auto_start:
             self.start()
 
@@ -41,6 +83,9 @@ class ProcessingWidget(QtWidgets.QWidget):
         self.mouse_y = 0
         self.prev_mouse_x = 0
         self.prev_mouse_y = 0
+        self._mouse_samples = deque(maxlen=_MAX_MOUSE_SAMPLES)
+        self._frame_mouse_samples = []
+        self.setMouseTracking(True)
 
     def set_size(self, width: int, height: int):
         """
@@ -97,25 +142,211 @@ class ProcessingWidget(QtWidgets.QWidget):
         self._timer.singleShot(duration, self._on_update_frame)
 
     def paintEvent(self, e: QtGui.QPaintEvent):
-        self._image.draw_to_device(self)
+        stats = self._frame_stats
+        if stats is None:
+            self._draw_frame(self)
+        else:
+            start_time = time.perf_counter_ns()
+            self._draw_frame(self)
+            if self._show_frame_stats:
+                p = QtGui.QPainter()
+                p.begin(self)
+                stats.draw_overlay(p)
+                p.end()
+            stats.add_paint_time(time.perf_counter_ns() - start_time)
+
+    def _draw_frame(self, device: QtGui.QPaintDevice):
+        """
+        Draw the canvas and the layers to the device.
+        """
+        if not self._layers:
+            self._image.draw_to_device(device)
+            return
+        below = self._composite_layers(self._below_cache, True)
+        above = self._composite_layers(self._above_cache, False)
+        p = QtGui.QPainter()
+        p.begin(device)
+        p.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        if below is not None:
+            p.drawImage(0, 0, below)
+            p.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+        p.drawImage(0, 0, self._image.get_image())
+        if above is not None:
+            p.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+            p.drawImage(0, 0, above)
+        p.end()
+
+    def _composite_layers(self, cache: _LayerCache, below: bool) -> QtGui.QImage:
+        """
+        Get the layers below (or above) the canvas, composited into one image.
+
+        The composited image is cached, and only re-composited when some of the layers are dirty.
+        """
+        layers = [layer for layer in self._layers if layer.below == below]
+        if not layers:
+            return None
+        if cache.dirty or any(layer.is_dirty() for layer in layers):
+            if cache.image is None or cache.image.size() != self._image.get_image().size():
+                cache.image = QtGui.QImage(self._image.get_image().size(),
+                                           QtGui.QImage.Format_ARGB32_Premultiplied)
+            cache.image.fill(QtCore.Qt.transparent)
+            p = QtGui.QPainter()
+            p.begin(cache.image)
+            for layer in layers:
+                p.drawImage(layer.x, layer.y, layer.image.get_image())
+                layer.composited_version = layer.image._version
+            p.end()
+            cache.dirty = False
+        return cache.image
+
+    def _get_layer_cache(self, layer: _Layer) -> _LayerCache:
+        return self._below_cache if layer.below else self._above_cache
+
+    def create_graphics(self, width: int, height: int, x: int = 0, y: int = 0, below: bool = False) -> Image:
+        """
+        Create an offscreen layer (like createGraphics() in Processing).
+
+        The layer is transparent when created, and is composited with the canvas every time the widget
+        is painted. The layers are cached, and are only re-composited when they are changed, so static
+        contents (like backgrounds) can be drawn on a layer once, instead of in every frame.
+
+        Layers below the canvas are only visible through the transparent parts of the canvas (see
+        Image.set_background_color()).
+
+        :param width: width of the layer
+        :param height: height of the layer
+        :param x: x coordinate of the layer's left-top corner on the canvas
+        :param y: y coordinate of the layer's left-top corner on the canvas
+        :param below: True to put the layer below the canvas, False to put it above the canvas
+        :return: the layer image
+        """
+        image = Image.create(width, height)
+        image.set_background_color(Color.TRANSPARENT)
+        layer = _Layer(image, x, y, below)
+        self._layers.append(layer)
+        self._get_layer_cache(layer).dirty = True
+        self.update()
+        return image
+
+    def move_graphics(self, image: Image, x: int, y: int):
+        """
+        Move the layer created by create_graphics().
+
+        :param image: the layer image
+        :param x: x coordinate of the layer's new left-top corner on the canvas
+        :param y: y coordinate of the layer's new left-top corner on the canvas
+        """
+        layer = self._find_layer(image)
+        layer.x = x
+        layer.y = y
+        self._get_layer_cache(layer).dirty = True
+        self.update()
+
+    def remove_graphics(self, image: Image):
+        """
+        Remove the layer created by create_graphics().
+
+        The layer image is closed, and can't be used anymore.
+
+        :param image: the layer image
+        """
+        layer = self._find_layer(image)
+        self._layers.remove(layer)
+        self._get_layer_cache(layer).dirty = True
+        image.close()
+        self.update()
+
+    def _find_layer(self, image: Image) -> _Layer:
+        for layer in self._layers:
+            if layer.image is image:
+                return layer
+        raise ValueError("The image is not a layer created by create_graphics()!")
 
     def redraw(self):
         """
         Call draw() to draw a frame once.
         """
-        pos = self.mapFromGlobal(QtGui.QCursor.pos())
-        self.mouse_x = pos.x()
-        self.mouse_y = pos.y()
-        self.get_canvas().save_settings()
-        self.draw()
-        self.update()
-        self.get_canvas().restore_settings()
+        self._frame_mouse_samples = list(self._mouse_samples)
+        self._mouse_samples.clear()
+        with self.get_canvas().settings():
+            self.draw()
+            self.update()
         self.prev_mouse_x = self.mouse_x
         self.prev_mouse_y = self.mouse_y
 
+    def get_mouse_samples(self) -> list:
+        """
+        Get all the mouse positions received since the last frame, in order.
+
+        Fast mouse moves between two frames are not collapsed to one position, so they can be used
+        to draw strokes accurately. The last sample is (mouse_x, mouse_y). At most the latest
+        1000 samples are kept.
+
+        :return: list of (x, y) positions. It's empty if the mouse is not moved.
+        """
+        return self._frame_mouse_samples
+
+    def _update_mouse_pos(self, pos: QtCore.QPoint):
+        self.mouse_x = pos.x()
+        self.mouse_y = pos.y()
+        self._mouse_samples.append((self.mouse_x, self.mouse_y))
+
+    def render_offline(self, frames: int, output: str = ".", format: str = "PNG", quality: int = -1,
+                       workers: int = None) -> dict:
+        """
+        Render frames as fast as possible, and save them to files.
+
+        draw() is called back-to-back, without waiting for the frame rate timer or painting the widget,
+        so the widget doesn't need to be shown. The frames are copied and then encoded and written by a
+        thread pool, while the next frames are drawn. The animation is stopped (see noloop()) after rendering.
+
+        The frames are saved as "frame00000.png", "frame00001.png", ... in the output dir.
+
+        See Image.save() for the format and quality parameters.
+
+        :param frames: number of frames to render
+        :param output: the dir to save the frames. It's created if not exists.
+        :param format: format of the frame files
+        :param quality: quality (or compression level) of the frame files
+        :param workers: number of the saving threads. None means the number of processors.
+        :return: dict of the rendered frames, the seconds used and the achieved fps
+        """
+        self._is_looping = False
+        os.makedirs(output, exist_ok=True)
+        filename_pattern = os.path.join(output, "frame{:05d}." + format.lower())
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # limit the frames waiting to be saved, so they won't use up the memory
+        max_pending = workers * 2
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(workers) as executor:
+            pending = []
+            for i in range(frames):
+                with self.get_canvas().settings():
+                    self.draw()
+                frame = self._capture_frame().copy()
+                pending.append(executor.submit(_save_image, frame, filename_pattern.format(i), format, quality))
+                if len(pending) > max_pending:
+                    pending.pop(0).result()
+            for future in pending:
+                future.result()
+        seconds = time.perf_counter() - start_time
+        return {
+            'frames': frames,
+            'seconds': seconds,
+            'fps': frames / seconds if seconds > 0 else 0,
+        }
+
     def _on_update_frame(self):
         start_time = time.perf_counter_ns()
-        self.redraw()
+        stats = self._frame_stats
+        if stats is None:
+            self.redraw()
+        else:
+            stats.wait_finished()
+            self.redraw()
+            stats.add_draw_time(time.perf_counter_ns() - start_time)
+            stats.end_frame()
         if self._is_looping:
             end_time = time.perf_counter_ns()
             time_used = (end_time - start_time) // 1000000
@@ -123,21 +354,25 @@ class ProcessingWidget(QtWidgets.QWidget):
             self._schedule_next_frame(duration)
 
     def mousePressEvent(self, e: QtGui.QMouseEvent):
+        self._update_mouse_pos(e.pos())
         self.on_mouse_pressed()
         self.mouse_pressed = True
         self.mouse_button = e.button()
 
     def mouseReleaseEvent(self, e: QtGui.QMouseEvent):
+        self._update_mouse_pos(e.pos())
         self.on_mouse_released()
         self.mouse_pressed = False
         self.on_mouse_clicked()
         self.mouse_button = QtCore.Qt.NoButton
 
     def mouseMoveEvent(self, e: QtGui.QMouseEvent):
+        self._update_mouse_pos(e.pos())
         if self.mouse_pressed:
             self.on_mouse_dragged()
 
     def wheelEvent(self, e: QtGui.QWheelEvent):
+        self._update_mouse_pos(e.pos())
         self.on_mouse_wheel(e)
 
     def keyPressEvent(self, e: QtGui.QKeyEvent):
@@ -147,7 +382,17 @@ class ProcessingWidget(QtWidgets.QWidget):
                             QtCore.Qt.ShiftModifier |
                             QtCore.Qt.AltModifier):
                 self._capture_count += 1
-                self._image.save(self._capture_dir + os.sep + "save{0}.png".format(self._capture_count))
+                self._capture_frame().save(self._capture_dir + os.sep + "save{0}.png".format(self._capture_count))
+
+    def _capture_frame(self) -> QtGui.QImage:
+        """
+        Get the current frame (the canvas composited with the layers).
+        """
+        if not self._layers:
+            return self._image.get_image()
+        frame = QtGui.QImage(self._image.get_image().size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        self._draw_frame(frame)
+        return frame
 
     def on_mouse_clicked(self):
         """
@@ -216,3 +461,30 @@ class ProcessingWidget(QtWidgets.QWidget):
         :return: the frame rate
         """
         return self._fps
+
+    def enable_frame_stats(self, enabled: bool = True, overlay: bool = False):
+        """
+        Turn on/off the per-frame instrumentation.
+
+        :param enabled: True to turn on, False to turn off
+        :param overlay: True to show the stats on the top-left corner of the widget
+        """
+        if enabled:
+            if self._frame_stats is None:
+                self._frame_stats = FrameStats()
+                self._image.add_updated_listener(self._frame_stats.add_primitive)
+        elif self._frame_stats is not None:
+            self._image.remove_updated_listener(self._frame_stats.add_primitive)
+            self._frame_stats = None
+        self._show_frame_stats = enabled and overlay
+        self.update()
+
+    def get_frame_stats(self) -> dict:
+        """
+        Get the per-frame instrumentation data.
+
+        :return: the stats dict
+        """
+        if self._frame_stats is None:
+            raise RuntimeError("Frame stats is not enabled! Call enable_frame_stats() first!")
+        return self._frame_stats.get_stats()
@@ -0,0 +1,318 @@
+"""
+Tiled rendering for images larger than the memory or Qt's image size limits.
+"""
+import heapq
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtGui, QtCore
+
+from easygraphics.consts import Color
+from easygraphics.image import Image, _calc_rect, _curve_points
+
+__all__ = ['TiledImage']
+
+# kinds of the recorded commands
+_STATE = 0
+_DRAW = 1
+
+# setters replayed on every tile
+_STATE_METHODS = ('set_color', 'set_fill_color', 'set_fill_rule', 'set_line_style', 'set_line_width',
+                  'set_fill_style', 'set_pen', 'set_brush', 'set_font', 'set_font_size', 'set_rect_mode',
+                  'set_ellipse_mode', 'set_composition_mode', 'set_render_quality', 'save_settings', 'restore_settings', 'set_flip_y')
+
+# methods that only change the transform. The transform is recorded with each drawing command.
+_TRANSFORM_METHODS = ('translate', 'rotate', 'scale', 'shear', 'reflect', 'set_transform', 'push_transform',
+                      'pop_transform', 'reset_transform')
+
+
+def _points_bounds(image: Image, *points) -> QtCore.QRectF:
+    xs = points[0::2]
+    ys = points[1::2]
+    return QtCore.QRectF(QtCore.QPointF(min(xs), min(ys)), QtCore.QPointF(max(xs), max(ys)))
+
+
+def _curve_bounds(image: Image, *points, **kwargs) -> QtCore.QRectF:
+    # the Catmull-Rom curve may go a little outside of its control points
+    points = _curve_points(points)
+    rect = QtCore.QRectF(QtCore.QPointF(*points.min(axis=0)), QtCore.QPointF(*points.max(axis=0)))
+    dx = rect.width() / 4
+    dy = rect.height() / 4
+    return rect.adjusted(-dx, -dy, dx, dy)
+
+
+def _rect_bounds(image: Image, x1, y1, x2, y2, *args) -> QtCore.QRectF:
+    return _calc_rect(x1, y1, x2, y2, image.get_rect_mode()).normalized()
+
+
+def _ellipse_bounds(image: Image, x1, y1, x2, y2) -> QtCore.QRectF:
+    return _calc_rect(x1, y1, x2, y2, image.get_ellipse_mode()).normalized()
+
+
+def _arc_bounds(image: Image, x1, y1, start_angle, end_angle, x2, y2) -> QtCore.QRectF:
+    return _ellipse_bounds(image, x1, y1, x2, y2)
+
+
+def _path_bounds(image: Image, path: QtGui.QPainterPath) -> QtCore.QRectF:
+    return path.boundingRect()
+
+
+def _text_bounds(image: Image, x, y, *args, sep=' ') -> QtCore.QRectF:
+    metrics = QtGui.QFontMetricsF(image.get_font())
+    text = sep.join(map(str, args))
+    rect = metrics.boundingRect(QtCore.QRectF(x, y - metrics.ascent(), 0, 0), QtCore.Qt.TextDontClip, text)
+    # leave room for the italic overhang, and the position adjustment when y is flipped
+    height = metrics.height()
+    return rect.adjusted(-height, -height, height, height)
+
+
+def _rect_text_bounds(image: Image, x, y, width, height, flags=QtCore.Qt.AlignCenter, *args, sep=' '):
+    if int(flags) & QtCore.Qt.TextDontClip:
+        return None
+    return QtCore.QRectF(x, y, width, height)
+
+
+def _image_bounds(image: Image, x, y, src_image: Image, src_x=0, src_y=0, src_width=-1, src_height=-1,
+                  *args, **kwargs) -> QtCore.QRectF:
+    if src_width <= 0:
+        src_width = src_image.get_width() - src_x
+    if src_height <= 0:
+        src_height = src_image.get_height() - src_y
+    return QtCore.QRectF(x, y, src_width, src_height)
+
+
+# drawing methods -> functions to calculate their bounds (in logical coordinates)
+_DRAW_METHODS = {
+    'draw_point': _points_bounds,
+    'draw_line': _points_bounds,
+    'draw_lines': _points_bounds,
+    'draw_poly_line': _points_bounds,
+    'polygon': _points_bounds,
+    'draw_polygon': _points_bounds,
+    'fill_polygon': _points_bounds,
+    'draw_bezier': _points_bounds,
+    'draw_quadratic': _points_bounds,
+    'draw_curve': _curve_bounds,
+    'rect': _rect_bounds,
+    'draw_rect': _rect_bounds,
+    'fill_rect': _rect_bounds,
+    'rounded_rect': _rect_bounds,
+    'draw_rounded_rect': _rect_bounds,
+    'fill_rounded_rect': _rect_bounds,
+    'ellipse': _ellipse_bounds,
+    'draw_ellipse': _ellipse_bounds,
+    'fill_ellipse': _ellipse_bounds,
+    'draw_arc': _arc_bounds,
+    'pie': _arc_bounds,
+    'draw_pie': _arc_bounds,
+    'fill_pie': _arc_bounds,
+    'chord': _arc_bounds,
+    'draw_chord': _arc_bounds,
+    'fill_chord': _arc_bounds,
+    'path': _path_bounds,
+    'draw_path': _path_bounds,
+    'fill_path': _path_bounds,
+    'draw_text': _text_bounds,
+    'draw_rect_text': _rect_text_bounds,
+    'draw_image': _image_bounds,
+}
+
+
+class TiledImage:
+    """
+    An image that records the drawing commands, and renders them tile by tile.
+
+    It has the same drawing methods as Image (draw_line(), fill_polygon(), draw_text(), draw_image(), ...),
+    the same setting methods (set_color(), set_font(), ...) and the same transform methods (translate(),
+    rotate(), scale(), ...). But nothing is drawn until render() or save_tiles() is called. Then only the
+    commands that overlap a tile are drawn on it, so the image can be much larger than a QImage.
+
+    flood_fill(), view ports, windows and clippings are not supported.
+
+    >>> from easygraphics import *
+    >>> init_graph(headless=True)
+    >>> poster = TiledImage(20000, 20000)
+    >>> poster.set_fill_color(Color.RED)
+    >>> poster.fill_ellipse(10000, 10000, 8000, 8000)
+    >>> poster.save_tiles("poster", levels=4)
+    >>> close_graph()
+    """
+
+    def __init__(self, width: int, height: int, background_color=Color.WHITE):
+        self._width = width
+        self._height = height
+        self._background_color = background_color
+        # a tiny image to keep the settings and the transform, for calculating the bounds of the commands
+        self._shadow = Image.create(1, 1)
+        self._shadow.set_background_color(background_color)
+        # (kind, method name, args, kwargs, transform, device bounds)
+        self._commands = []
+
+    def get_width(self) -> int:
+        return self._width
+
+    def get_height(self) -> int:
+        return self._height
+
+    def get_background_color(self):
+        return self._background_color
+
+    def set_background_color(self, background_color):
+        """
+        Set the background color of the whole image.
+
+        :param background_color: background color
+        """
+        self._background_color = background_color
+
+    def __getattr__(self, name: str):
+        # forward the getters (get_color(), get_transform(), text_width(), ...) to the shadow image
+        if name.startswith("get_") or name.startswith("text_"):
+            return getattr(self._shadow, name)
+        raise AttributeError("'TiledImage' object has no attribute '{}'".format(name))
+
+    def _record_state(self, name: str, *args, **kwargs):
+        getattr(self._shadow, name)(*args, **kwargs)
+        self._commands.append((_STATE, name, args, kwargs, None, None))
+
+    def _record_transform(self, name: str, *args, **kwargs):
+        getattr(self._shadow, name)(*args, **kwargs)
+
+    def _record_draw(self, name: str, *args, **kwargs):
+        # the cached transform is never modified, so commands recorded with the same transform share it
+        transform = self._shadow._get_transform()
+        rect = _DRAW_METHODS[name](self._shadow, *args, **kwargs)
+        if rect is not None:
+            # pad for the pen width (cosmetic pens are in device pixels)
+            pad = self._shadow.get_line_width() / 2 + 2
+            rect = transform.mapRect(rect).adjusted(-pad, -pad, pad, pad)
+        self._commands.append((_DRAW, name, args, kwargs, transform, rect))
+
+    def move_to(self, x: float, y: float):
+        self._shadow.move_to(x, y)
+
+    def move_rel(self, dx: float, dy: float):
+        self._shadow.move_rel(dx, dy)
+
+    def line_to(self, x: float, y: float):
+        self.draw_line(self._shadow.get_x(), self._shadow.get_y(), x, y)
+        self._shadow.move_to(x, y)
+
+    def line_rel(self, dx: float, dy: float):
+        self.line_to(self._shadow.get_x() + dx, self._shadow.get_y() + dy)
+
+    def clear(self):
+        """
+        Clear the image, all recorded commands are dropped.
+        """
+        del self._commands[:]
+
+    def close(self):
+        self._commands = []
+        self._shadow.close()
+
+    def render(self, x: int = 0, y: int = 0, width: int = None, height: int = None, scale: float = 1) -> Image:
+        """
+        Render a part of the image to a new Image.
+
+        :param x: x coordinate of the part's top-left corner (in the scaled image)
+        :param y: y coordinate of the part's top-left corner (in the scaled image)
+        :param width: width of the part. None means all the way to the right.
+        :param height: height of the part. None means all the way to the bottom.
+        :param scale: scale factor of the rendering (e.g. 0.5 to render at half size)
+        :return: the rendered image
+        """
+        if width is None:
+            width = math.ceil(self._width * scale) - x
+        if height is None:
+            height = math.ceil(self._height * scale) - y
+        region = QtCore.QRectF(x / scale, y / scale, width / scale, height / scale)
+        commands = [i for i, command in enumerate(self._commands)
+                    if command[0] == _STATE or command[5] is None or command[5].intersects(region)]
+        return self._render_commands(commands, x, y, width, height, scale)
+
+    def _render_commands(self, commands, x: int, y: int, width: int, height: int, scale: float) -> Image:
+        image = Image.create(width, height)
+        image.set_background_color(self._background_color)
+        offset = QtGui.QTransform.fromScale(scale, scale) * QtGui.QTransform.fromTranslate(-x, -y)
+        for i in commands:
+            kind, name, args, kwargs, transform, rect = self._commands[i]
+            if kind == _DRAW:
+                image.set_transform(transform * offset)
+            getattr(image, name)(*args, **kwargs)
+        return image
+
+    def save_tiles(self, directory: str, tile_size: int = 256, format: str = "PNG", levels: int = 1,
+                   workers: int = None):
+        """
+        Render the image tile by tile, and save the tiles to the directory.
+
+        The tiles are saved as "directory/level/row_col.format". Level 0 is the full size image, each next
+        level is half the size of the previous one (an image pyramid for zoomable viewers).
+
+        :param directory: the directory to save the tiles in
+        :param tile_size: width and height of the tiles
+        :param format: format of the tile files
+        :param levels: number of the levels in the pyramid
+        :param workers: number of the threads to render the tiles. None means the number of processors.
+        """
+        state_commands = [i for i, command in enumerate(self._commands) if command[0] == _STATE]
+        with ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+            futures = []
+            for level in range(levels):
+                scale = 1 / (2 ** level)
+                level_dir = os.path.join(directory, str(level))
+                os.makedirs(level_dir, exist_ok=True)
+                for (row, col), commands in self._split_to_tiles(tile_size / scale, state_commands).items():
+                    filename = os.path.join(level_dir, "{}_{}.{}".format(row, col, format.lower()))
+                    futures.append(executor.submit(self._save_tile, commands, row, col, tile_size, scale,
+                                                   filename, format))
+            for future in futures:
+                future.result()
+
+    def _split_to_tiles(self, tile_size: float, state_commands: list) -> dict:
+        """ get the commands of each tile. tile_size is in the full size image """
+        columns = max(math.ceil(self._width / tile_size), 1)
+        rows = max(math.ceil(self._height / tile_size), 1)
+        draw_commands = {(row, col): [] for row in range(rows) for col in range(columns)}
+        for i, command in enumerate(self._commands):
+            if command[0] != _DRAW:
+                continue
+            rect = command[5]
+            if rect is None:
+                row_range = range(rows)
+                col_range = range(columns)
+            else:
+                row_range = range(max(int(rect.top() // tile_size), 0), min(int(rect.bottom() // tile_size) + 1, rows))
+                col_range = range(max(int(rect.left() // tile_size), 0),
+                                  min(int(rect.right() // tile_size) + 1, columns))
+            for row in row_range:
+                for col in col_range:
+                    draw_commands[row, col].append(i)
+        # both lists are in the recorded order, merge them to keep it
+        return {tile: list(heapq.merge(state_commands, commands)) for tile, commands in draw_commands.items()}
+
+    def _save_tile(self, commands, row: int, col: int, tile_size: int, scale: float, filename: str, format: str):
+        width = min(tile_size, math.ceil(self._width * scale) - col * tile_size)
+        height = min(tile_size, math.ceil(self._height * scale) - row * tile_size)
+        image = self._render_commands(commands, col * tile_size, row * tile_size, width, height, scale)
+        image.save(filename, format=format)
+        image.close()
+
+
+def _make_recorder(name: str, record):
+    def method(self, *args, **kwargs):
+        record(self, name, *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = getattr(Image, name).__doc__
+    return method
+
+
+for _name in _STATE_METHODS:
+    setattr(TiledImage, _name, _make_recorder(_name, TiledImage._record_state))
+for _name in _TRANSFORM_METHODS:
+    setattr(TiledImage, _name, _make_recorder(_name, TiledImage._record_transform))
+for _name in _DRAW_METHODS:
+    setattr(TiledImage, _name, _make_recorder(_name, TiledImage._record_draw))
@@ -45,6 +45,8 @@ class TurtleWorld(object):
         self._buffer_image.set_flip_y(True)
         self._turtles = []
         self._running = True
+        self._changed_listeners = []
+        self._world_image.add_updated_listener(self._changed)
         if self._win is not None:
             self._immediate = False
             self._win.set_immediate(False)
@@ -58,6 +60,7 @@ class TurtleWorld(object):
         Close the turtles world.
         """
         self._running = False
+        self._changed_listeners.clear()
         for turtle in self._turtles:
             turtle.close()
         self._turtles.clear()
@@ -110,6 +113,30 @@ class TurtleWorld(object):
         :param turtle: the turtle
         """
         self._turtles.append(turtle)
+        self._changed()
+
+    def add_changed_listener(self, listener):
+        """
+        Add a listener for the changed event.
+
+        The listener is called when the world image is drawn, or a turtle is moved, turned, shown or hidden.
+        It may be called in the thread running the turtle code.
+
+        :param listener: the listener (a callable without parameters)
+        """
+        self._changed_listeners.append(listener)
+
+    def remove_changed_listener(self, listener):
+        """
+        Remove a listener for the changed event.
+
+        :param listener: the listener to remove
+        """
+        self._changed_listeners.remove(listener)
+
+    def _changed(self):
+        for listener in self._changed_listeners:
+            listener()
 
     def create_turtle(self):
         """
@@ -524,12 +551,14 @@ class Turtle(object):
         Show the turtle.
         """
         self._show_turtle = True
+        self._world._changed()
 
     def hide(self):
         """
         Hide the turtle.
         """
         self._show_turtle = False
+        self._world._changed()
 
     def gotoxy(self, x, y):
         """
@@ -542,6 +571,7 @@ class Turtle(object):
             self._world.get_world_image().line(x, y, self._x, self._y)
         self._x = x
         self._y = y
+        self._world._changed()
         if self.is_filling():
             self._fillpath.append(self._x)
             self._fillpath.append(self._y)
@@ -555,6 +585,7 @@ class Turtle(object):
         """
         self._x = x
         self._y = y
+        self._world._changed()
         if self.is_filling():
             self._fillpath.append(self._x)
             self._fillpath.append(self._y)
@@ -566,6 +597,7 @@ class Turtle(object):
         :param angle: the new heading angle (in degrees).
         """
         self._heading = angle
+        self._world._changed()
 
     def turn_to(self, angle):
         """
@@ -680,6 +712,7 @@ class Turtle(object):
         return not rect.contains(round(p_device.x()), round(p_device.y()))
 
     def _refresh(self):
+        self._world._changed()
         if not self._world.is_immediate():
             self._delay_fps(self._speed)
 
@@ -1,7 +1,8 @@
 from PyQt5.QtGui import QMatrix4x4, QVector3D
 import math
+import numpy as np
 
-__all__ = ['ortho_look_at', 'isometric_projection', 'spher2cart', 'cart2spher']
+__all__ = ['ortho_look_at', 'isometric_projection', 'spher2cart', 'cart2spher', 'project_points', 'project_mesh']
 
 
 def isometric_projection() -> QMatrix4x4:
@@ -167,3 +168,63 @@ def spher2cart(r: float, theta: float, phi: float) -> (float, float, float):
     y = r * math.sin(theta) * math.sin(phi)
     z = r * math.cos(theta)
     return x, y, z
+
+
+def _matrix_to_array(matrix: QMatrix4x4) -> np.ndarray:
+    # QMatrix4x4.data() is in column-major order
+    return np.array(matrix.data(), dtype=np.float64).reshape(4, 4).T
+
+
+def project_points(matrix: QMatrix4x4, vertices) -> np.ndarray:
+    """
+    Map 3d points to 2d with the projection matrix, in one matrix multiply.
+
+    It gives the same result as calling matrix.map() on each point.
+
+    :param matrix: the projection matrix (see ortho_look_at() and isometric_projection())
+    :param vertices: (N,3) array like of the 3d points
+    :return: (N,2) array of the projected points
+    """
+    m = _matrix_to_array(matrix)
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    mapped = vertices @ m[:3, :3].T + m[:3, 3]
+    w = vertices @ m[3, :3] + m[3, 3]
+    return mapped[:, :2] / w[:, np.newaxis]
+
+
+def project_mesh(matrix: QMatrix4x4, vertices, faces, cull_back_faces: bool = True) -> (np.ndarray, np.ndarray):
+    """
+    Project a mesh to 2d with an orthographic projection matrix.
+
+    All vertices are mapped in one matrix multiply. Then back faces are removed (if cull_back_faces is True),
+    and the faces are sorted from back to front, so drawing them in order hides the faces behind.
+
+    Faces must be defined counter-clockwise when seen from the outside of the mesh, and all faces must
+    have the same number of vertices.
+
+    :param matrix: the projection matrix (see ortho_look_at() and isometric_projection())
+    :param vertices: (N,3) array like of the 3d vertices
+    :param faces: (M,K) array like of vertex indexes, each row is a face with K vertices
+    :param cull_back_faces: True to remove the faces facing away from the viewer
+    :return: (M',K,2) array of the projected faces (sorted from back to front),
+        and (M',) array of their indexes in the faces array
+    """
+    m = _matrix_to_array(matrix)
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.intp)
+    if faces.ndim != 2 or faces.shape[1] < 3:
+        raise ValueError("faces must be a (M,K) array with K >= 3!")
+    # the viewer looks along -view_z. ortho_look_at() drops the z row, so recover it from the x and y rows.
+    view_z = m[2, :3]
+    if not np.any(view_z):
+        view_z = np.cross(m[0, :3], m[1, :3])
+    points = project_points(matrix, vertices)
+    depths = vertices @ view_z
+    indexes = np.arange(len(faces))
+    if cull_back_faces:
+        v0 = vertices[faces[:, 0]]
+        normals = np.cross(vertices[faces[:, 1]] - v0, vertices[faces[:, 2]] - v0)
+        indexes = indexes[normals @ view_z > 0]
+    order = np.argsort(depths[faces[indexes]].mean(axis=1), kind='stable')
+    indexes = indexes[order]
+    return points[faces[indexes]], indexes
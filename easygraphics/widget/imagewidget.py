@@ -1,3 +1,6 @@
+import math
+
+import numpy as np
 from easygraphics.image import Image
 from PyQt5 import QtCore, QtWidgets, QtGui
 
@@ -5,9 +8,20 @@ __all__ = ['ImageWidget']
 
 
 class ImageWidget(QtWidgets.QWidget):
+    # emitted by the image updated listener, which may run in other threads
+    _image_updated = QtCore.pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._image = None
+        self._scale = 1
+        self._update_pending = False
+        # the scaled image is cached as a pixmap, until the image is changed
+        self._scaled_pixmap = None
+        self._scaled_version = -1
+        # copy of the pixels when the widget is last updated, to find the changed (dirty) rect
+        self._shown_pixels = None
+        self._image_updated.connect(self._on_image_updated, QtCore.Qt.QueuedConnection)
 
     def setImage(self, image: Image):
         """
@@ -15,10 +29,14 @@ class ImageWidget(QtWidgets.QWidget):
 
         :param image: the underlying image object
         """
+        if self._image is not None:
+            self._image.remove_updated_listener(self._schedule_update)
         self._image = image
-        image.add_updated_listener(self.update)
-        self.setFixedWidth(image.get_width())
-        self.setFixedHeight(image.get_height())
+        self._scaled_pixmap = None
+        # the whole widget is painted when it's shown
+        self._shown_pixels = image._image_view.copy()
+        image.add_updated_listener(self._schedule_update)
+        self._update_size()
 
     def getImage(self) -> Image:
         """
@@ -28,9 +46,100 @@ class ImageWidget(QtWidgets.QWidget):
         """
         return self._image
 
+    def setScale(self, scale: float):
+        """
+        Set the display scale of the image.
+
+        The scaled image is cached, and only scaled again when the image is changed.
+
+        :param scale: the scale factor. 1 means the image is displayed in its original size.
+        """
+        if scale <= 0:
+            raise ValueError("scale must be > 0!")
+        self._scale = scale
+        self._scaled_pixmap = None
+        if self._image is not None:
+            self._update_size()
+        self.update()
+
+    def getScale(self) -> float:
+        """
+        Get the display scale of the image.
+
+        :return: the scale factor
+        """
+        return self._scale
+
+    def _update_size(self):
+        self.setFixedWidth(round(self._image.get_width() * self._scale))
+        self.setFixedHeight(round(self._image.get_height() * self._scale))
+
+    def _schedule_update(self):
+        # many updates of the image between two repaints only trigger one repaint
+        if not self._update_pending:
+            self._update_pending = True
+            self._image_updated.emit()
+
+    def _on_image_updated(self):
+        self._update_pending = False
+        rect = self._take_dirty_rect()
+        if rect is None:
+            return
+        if self._scale != 1:
+            # cover the scaled pixels partly in the rect too
+            left = math.floor(rect.x() * self._scale)
+            top = math.floor(rect.y() * self._scale)
+            right = math.ceil((rect.x() + rect.width()) * self._scale)
+            bottom = math.ceil((rect.y() + rect.height()) * self._scale)
+            rect = QtCore.QRect(left, top, right - left, bottom - top).adjusted(-1, -1, 1, 1)
+        self.update(rect)
+
+    def _take_dirty_rect(self) -> QtCore.QRect:
+        """
+        Get the rect covering all the pixels changed since the last call, and remember the new pixels.
+
+        The image updated events don't tell where the image is changed, so the pixels are compared
+        with the copy taken at the last update.
+
+        :return: the dirty rect, or None if nothing is changed
+        """
+        view = self._image._image_view
+        if self._shown_pixels is None or self._shown_pixels.shape != view.shape:
+            self._shown_pixels = view.copy()
+            return QtCore.QRect(0, 0, view.shape[1], view.shape[0])
+        changed = view != self._shown_pixels
+        rows = np.flatnonzero(changed.any(axis=1))
+        if len(rows) == 0:
+            return None
+        columns = np.flatnonzero(changed.any(axis=0))
+        top, bottom = rows[0], rows[-1] + 1
+        left, right = columns[0], columns[-1] + 1
+        self._shown_pixels[top:bottom, left:right] = view[top:bottom, left:right]
+        return QtCore.QRect(int(left), int(top), int(right - left), int(bottom - top))
+
+    def _get_scaled_pixmap(self) -> QtGui.QPixmap:
+        image = self._image
+        if self._scaled_pixmap is None or self._scaled_version != image._version:
+            mode = QtCore.Qt.SmoothTransformation if self._scale < 1 else QtCore.Qt.FastTransformation
+            self._scaled_pixmap = QtGui.QPixmap.fromImage(
+                image.get_image().scaled(self.width(), self.height(), QtCore.Qt.IgnoreAspectRatio, mode))
+            self._scaled_version = image._version
+        return self._scaled_pixmap
+
     def paintEvent(self, e: QtGui.QPaintEvent):
-        self._image.draw_to_device(self)
+        if self._image is None:
+            return
+        rect = e.rect()
+        if self._scale == 1:
+            self._image.draw_to_device(self, rect)
+        else:
+            p = QtGui.QPainter()
+            p.begin(self)
+            p.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+            p.drawPixmap(rect, self._get_scaled_pixmap(), rect)
+            p.end()
 
     def close(self):
-        self._image.remove_updated_listener(self.update)
-        super.close()
+        if self._image is not None:
+            self._image.remove_updated_listener(self._schedule_update)
+        super().close()
@@ -7,7 +7,14 @@ from PyQt5 import QtCore, QtWidgets, QtGui
 __all__ = ['TurtleWidget']
 
 
+# the minimum interval between two refreshes (one frame at 60 fps)
+_REFRESH_INTERVAL_NS = 1000000000 // 60
+
+
 class TurtleWidget(QtWidgets.QWidget):
+    # emitted by the world changed listener, which may run in the thread of the turtle code
+    _world_changed = QtCore.pyqtSignal()
+
     def __init__(self, parent=None, width=600, height=400):
         super().__init__(parent)
         self._image = Image.create(width, height)
@@ -17,7 +24,13 @@ class TurtleWidget(QtWidgets.QWidget):
         self._world = TurtleWorld(self._image)
         self._turtle = self._world.create_turtle()
         self._is_running = True
-        self._last_fps_time = 0
+        self._refresh_pending = False
+        self._last_refresh_time = 0
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self._refresh)
+        self._world_changed.connect(self._schedule_refresh, QtCore.Qt.QueuedConnection)
+        self._world.add_changed_listener(self._on_world_changed)
 
     def closeEvent(self, e: QtGui.QCloseEvent):
         self.close()
@@ -28,16 +41,18 @@ class TurtleWidget(QtWidgets.QWidget):
         Close the widget.
 
         """
-        self._is_running = False
-        self._world.close()
-        self._image.close()
+        if self._is_running:
+            self._is_running = False
+            self._refresh_timer.stop()
+            self._world.close()
+            self._image.close()
         super().close()
 
     def hideEvent(self, QHideEvent):
-        self._is_running = False
+        self._refresh_timer.stop()
 
     def showEvent(self, QShowEvent):
-        self._start_refresh_loop()
+        self._refresh()
 
     def is_run(self):
         """
@@ -64,39 +79,35 @@ class TurtleWidget(QtWidgets.QWidget):
         return self._turtle
 
     def paintEvent(self, e: QtGui.QPaintEvent):
-        self._canvas.draw_to_device(self)
+        self._canvas.draw_to_device(self, e.rect())
 
-    def _refresh(self):
-        self._world.snap_shot_to_image(self._canvas)
+    def _on_world_changed(self):
+        # many changes of the world between two refreshes only trigger one refresh
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self._world_changed.emit()
 
-    def _start_refresh_loop(self):
-        self._refresh_thread = threading.Thread(target=self._refresh_loop)
-        self._refresh_thread.start()
+    def _schedule_refresh(self):
+        """
+        Refresh on the next frame, so the world is composited at most once per frame.
+        """
+        if not self._is_running or not self.isVisible() or self._refresh_timer.isActive():
+            return
+        wait = self._last_refresh_time + _REFRESH_INTERVAL_NS - time.perf_counter_ns()
+        self._refresh_timer.start(max(0, wait // 1000000))
 
-    def _refresh_loop(self):
-        while self.is_run():
-            self._refresh()
-            self._delay_fps(60)
-        self.close()
+    def _refresh(self):
+        if not self._is_running:
+            return
+        # reset before the snap shot, so the changes made meanwhile trigger another refresh
+        self._refresh_pending = False
+        self._last_refresh_time = time.perf_counter_ns()
+        self._world.snap_shot_to_image(self._canvas)
+        self.update()
 
     def __del__(self):
         self.close()
 
-    def _delay_fps(self, fps: int):
-        """
-        Delay to control fps without frame skipping. Never skip frames.
-
-        :param fps: the desire fps
-        """
-        nanotime = 1000000000 // fps
-        if self._last_fps_time == 0:
-            self._last_fps_time = time.perf_counter_ns()
-        self.update()
-        tt = time.perf_counter_ns()
-        if tt - self._last_fps_time < nanotime:
-            QtCore.QThread.usleep((self._last_fps_time + nanotime - tt) // 1000)
-        self._last_fps_time = time.perf_counter_ns()
-
     def run_animated_code(self, f):
         """
         Run turtle code.
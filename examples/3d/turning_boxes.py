@@ -1,7 +1,7 @@
 import math
 
 from easygraphics import *
-from PyQt5.QtGui import QMatrix4x4, QVector3D
+from PyQt5.QtGui import QMatrix4x4
 import random
 
 
@@ -58,7 +58,6 @@ set_render_mode(RenderMode.RENDER_MANUAL)
 degree = 0
 fps = 30
 m_o = isometric_projection()
-points = []
 
 while is_run():
     if random.choice((-1, 1)) == 1:
@@ -82,13 +81,7 @@ while is_run():
                            -sin_2, cos_2, 0, 0,
                            0, 0, 1, 0,
                            0, 0, 0, 1)
-            points.clear()
-            for p in box.points:
-                x, y, z = p
-                v = QVector3D(x, y, z)
-                v2 = m.map(v)
-                v3 = m_o.map(v2)
-                points.append((v3.x(), v3.y()))
+            points = project_points(m_o * m, box.points)
             draw_box(points)
         delay_fps(fps)
     delay(1000)
@@ -0,0 +1,28 @@
+"""
+Shared fixtures of the automated tests.
+
+The tests run without a display, on Qt's offscreen platform.
+"""
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+
+import easygraphics as eg
+
+
+@pytest.fixture(scope="session")
+def graph():
+    """ the graphics window, shared by all the tests """
+    eg.init_graph(400, 300)
+    eg.set_render_mode(eg.RenderMode.RENDER_MANUAL)
+    yield eg.get_graphics_window()
+    eg.close_graph()
+
+
+@pytest.fixture
+def image(graph):
+    img = eg.create_image(200, 100)
+    yield img
+    img.close()
@@ -0,0 +1,200 @@
+"""
+Tests of the drawing settings, pages, events, batch rendering and caches.
+
+Run them with:
+
+.. code-block:: shell
+
+    python -m pytest tests
+"""
+import os
+
+import numpy as np
+import pytest
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+import easygraphics as eg
+from easygraphics import Color, Image, TiledImage
+from easygraphics._utils import invoke_in_app_thread
+
+
+def _render_number(n: int) -> bytes:
+    # module level, so it can be run in the render_many() worker processes
+    img = eg.create_image(20, 10)
+    img.set_fill_color(Color.RED)
+    img.fill_rect(0, 0, n, n)
+    return img.to_bytes(format="RGBA")
+
+
+# settings stack #
+
+def test_nested_settings_are_restored(image):
+    image.set_color(Color.RED)
+    image.save_settings()
+    image.set_color(Color.BLUE)
+    with image.settings():
+        image.set_color(Color.GREEN)
+        image.translate(10, 10)
+    assert image.get_color() == QtGui.QColor(Color.BLUE)
+    assert image.get_transform().dx() == 0
+    image.restore_settings()
+    assert image.get_color() == QtGui.QColor(Color.RED)
+
+
+def test_restore_settings_without_save_raises(image):
+    with pytest.raises(RuntimeError):
+        image.restore_settings()
+
+
+# raw painter access #
+
+def test_text_metrics_follow_painter_font(image):
+    width = image.text_width("Hello")
+    font = QtGui.QFont(image.get_font())
+    font.setPixelSize(40)
+    image.get_painter().setFont(font)
+    assert image.text_width("Hello") > width
+    assert image.text_height() >= 40
+
+
+def test_transform_follows_painter(image):
+    image.get_painter().translate(10, 10)
+    assert image.get_transform().dx() == 10
+    assert image.map_points([(1, 1)]).tolist() == [[11, 11]]
+
+
+def test_foreground_follows_painter_drawing(image):
+    dst = eg.create_image(200, 100)
+    image.to_bytes(False)
+    image.get_painter().fillRect(0, 0, 20, 20, QtCore.Qt.blue)
+    image.get_mask_painter().fillRect(0, 0, 20, 20, QtCore.Qt.black)
+    dst.draw_image(0, 0, image, with_background=False)
+    assert dst.get_pixel(5, 5) == QtGui.QColor(Color.BLUE)
+    dst.close()
+
+
+# shapes #
+
+def test_vertex_color_in_poly_line_raises(image):
+    image.begin_shape()
+    with pytest.raises(ValueError):
+        image.vertex(1, 1, Color.RED)
+    image.vertex(1, 1)
+    image.vertex(50, 50)
+    image.end_shape()
+
+
+# render quality #
+
+def test_render_quality(image):
+    for quality in (eg.RenderQuality.LOW, eg.RenderQuality.NORMAL, eg.RenderQuality.HIGH):
+        image.set_render_quality(quality)
+        assert image.get_render_quality() == quality
+    with pytest.raises(ValueError):
+        image.set_render_quality(100)
+
+
+def test_flood_fill_antialiased_shape(image):
+    image.set_render_quality(eg.RenderQuality.HIGH)
+    image.set_color(Color.BLACK)
+    image.draw_ellipse(100, 50, 40, 40)
+    image.set_fill_color(Color.RED)
+    image.flood_fill(100, 50, Color.BLACK)
+    assert image.get_pixel(100, 50) == QtGui.QColor(Color.RED)
+    assert image.get_pixel(2, 2) == QtGui.QColor(Color.WHITE)
+
+
+# pages #
+
+def test_pages(graph):
+    eg.set_color(Color.RED)
+    eg.set_fill_color(Color.BLUE)
+    try:
+        eg.set_active_page(1)
+        eg.set_visual_page(0)
+        page = eg.get_target()
+        assert page is graph.get_page(1)
+        assert page.get_fill_color() == QtGui.QColor(Color.BLUE)
+        eg.fill_rect(0, 0, 20, 20)
+        assert page.get_pixel(10, 10) == QtGui.QColor(Color.BLUE)
+        assert graph.get_canvas().get_pixel(10, 10) != QtGui.QColor(Color.BLUE)
+        eg.set_visual_page(1)
+        assert graph.get_canvas() is page
+        eg.set_active_page(0)
+        eg.set_target()
+        assert eg.get_target() is graph.get_page(0)
+        with pytest.raises(ValueError):
+            eg.set_active_page(-1)
+    finally:
+        eg.set_active_page(0)
+        eg.set_visual_page(0)
+        eg.set_target()
+
+
+def test_frame_stats_with_page_flipping(graph):
+    eg.enable_frame_stats()
+    try:
+        for i in range(3):
+            eg.set_active_page(1 - i % 2)
+            eg.set_visual_page(i % 2)
+            eg.clear_device()
+            eg.circle(50, 50, 20)
+            eg.delay_fps(60)
+        assert eg.get_frame_stats()['last_frame']['primitives'] == 2
+    finally:
+        eg.enable_frame_stats(False)
+        eg.set_active_page(0)
+        eg.set_visual_page(0)
+
+
+# events #
+
+def test_poll_events(graph):
+    eg.poll_events()
+    event = QtGui.QMouseEvent(QtCore.QEvent.MouseButtonPress, QtCore.QPointF(12, 34), QtCore.Qt.LeftButton,
+                              QtCore.Qt.LeftButton, QtCore.Qt.NoModifier)
+    invoke_in_app_thread.invoke_in_app_thread(QtWidgets.QApplication.sendEvent, graph, event)
+    events = eg.poll_events()
+    assert [(e.type, e.x, e.y) for e in events] == [(eg.EventType.MOUSE_PRESS, 12, 34)]
+    assert eg.poll_events() == []
+
+
+# batch rendering #
+
+def test_save_images(image, tmp_path):
+    image.set_fill_color(Color.RED)
+    image.fill_rect(0, 0, 10, 10)
+    filenames = [str(tmp_path / "image{}.png".format(i)) for i in range(3)]
+    eg.save_images([(image, filename) for filename in filenames], workers=2)
+    for filename in filenames:
+        assert QtGui.QImage(filename).pixelColor(5, 5) == QtGui.QColor(Color.RED)
+
+
+def test_render_many(graph):
+    results = eg.render_many(_render_number, [2, 5], workers=2)
+    expected = [_render_number(2), _render_number(5)]
+    assert results == expected
+
+
+def test_tiled_image(graph, tmp_path):
+    poster = TiledImage(600, 400)
+    poster.set_fill_color(Color.RED)
+    poster.fill_rect(500, 300, 550, 350)
+    part = poster.render(480, 280, 100, 100)
+    assert part.get_pixel(40, 40) == QtGui.QColor(Color.RED)
+    assert part.get_pixel(5, 5) == QtGui.QColor(Color.WHITE)
+    part.close()
+    poster.save_tiles(str(tmp_path), tile_size=256, levels=2)
+    assert os.path.exists(os.path.join(str(tmp_path), "0", "1_1.png"))
+    poster.close()
+
+
+def test_create_mapped(graph, tmp_path):
+    filename = str(tmp_path / "mapped.raw")
+    img = Image.create_mapped(64, 32, filename, map_mask=True)
+    img.set_fill_color(Color.RED)
+    img.fill_rect(0, 0, 10, 10)
+    img.close()
+    pixels = np.fromfile(filename, dtype=np.uint32).reshape(32, 64)
+    assert pixels[5, 5] == QtGui.QColor(Color.RED).rgba()
+    assert os.path.getsize(filename + ".mask") == 64 * 32